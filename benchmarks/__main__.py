@@ -0,0 +1,65 @@
+"""
+Executable CLI to run the benchmark suite, invoke with python -m benchmarks -h
+from the project root.
+
+Results are written as JSON. Pass a previously saved result file with
+--baseline to compare against it; the exit status is nonzero if any benchmark
+regressed by more than the tolerance.
+"""
+# pylint: disable=missing-function-docstring
+
+import argparse
+import json
+import platform
+import sys
+
+import numpy as np
+
+from benchmarks import suite
+
+def main():
+    parser = argparse.ArgumentParser(description='Runs the benchmark suite.')
+    parser.add_argument('names', nargs='*',
+                        help='Benchmarks to run, defaults to all of them')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='Times to run each benchmark, keeping the best')
+    parser.add_argument('--output', type=argparse.FileType('w'),
+                        default=sys.stdout,
+                        help='File to write the JSON results to')
+    parser.add_argument('--baseline', type=argparse.FileType('r'),
+                        help='JSON results of a previous run to compare to')
+    parser.add_argument('--tolerance', type=float, default=0.1,
+                        help='Relative slowdown allowed before a benchmark '
+                             'counts as a regression')
+    parser.add_argument('--list', action='store_true',
+                        help='List the available benchmarks and exit')
+    args = parser.parse_args()
+
+    if args.list:
+        for name, (_, unit, _) in suite.BENCHMARKS.items():
+            print(f'{name:30}{unit}')
+        return 0
+
+    if unknown := set(args.names) - set(suite.BENCHMARKS):
+        parser.error('unknown benchmarks: {}'.format(', '.join(unknown)))
+    results = suite.run(args.names, args.repeat)
+    with args.output as output:
+        json.dump({
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'benchmarks': results,
+        }, output, indent=2)
+        output.write('\n')
+
+    if args.baseline is None:
+        return 0
+    with args.baseline as baseline:
+        comparison = suite.compare(
+            results, json.load(baseline)['benchmarks'], args.tolerance)
+    for name, base, value, change, regression in comparison:
+        print(f'{name:30}{base:14.2f}{value:14.2f}{change:+9.1%}' +
+              ('  REGRESSION' if regression else ''), file=sys.stderr)
+    return 1 if any(row[-1] for row in comparison) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,364 @@
+"""
+The benchmark suite measuring the throughput of the field, the chromosome
+strategy, game simulation and training. Every benchmark uses fixed seeds and
+fixed fields, so results are comparable between runs.
+"""
+
+import contextlib
+import io
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from lib.batch_tetris_driver import place_all
+from lib.bit_field import BitField
+from lib.evaluation_cache import EvaluationCache
+from lib.features import FEATURES, FeatureExtractor
+from lib.field import Field
+from lib.game_record import GameRecord, GameRecorder
+from lib.genetic_algorithm.population import Population
+from lib.genetic_algorithm.tetris_chromosome import TetrisChromosome
+from lib.piece_source import PieceSource
+from lib.tetris_driver import TetrisDriver
+from lib.tetromino import ORIENTATIONS
+
+GENES = np.array([0.9, 0.5, 0.3, 0.2, 0.1])
+
+# Maps the name of each benchmark to the function running it, the unit it is
+# reported in and whether a higher value is better.
+BENCHMARKS = {}
+
+def benchmark(name, unit, higher_is_better=True):
+    """
+    Decorator registering a benchmark function under the given name. The
+    function must return the number of operations it performed and the time
+    they took in seconds.
+    """
+    def register(function):
+        BENCHMARKS[name] = (function, unit, higher_is_better)
+        return function
+    return register
+
+def fixed_fields(field_class, n_fields=32, seed=0):
+    """
+    Returns a list of fields of the given class built by dropping a seeded
+    random sequence of tetrominos, restarting whenever the stack gets high.
+    """
+    rng = random.Random(seed)
+    fields = []
+    field = field_class.create()
+    while len(fields) < n_fields:
+        orientation = rng.choice(ORIENTATIONS[rng.choice(list(ORIENTATIONS))])
+        field.drop(orientation.tetromino,
+                   rng.randrange(Field.WIDTH - orientation.width + 1))
+        if max(field.heights()) > Field.HEIGHT // 2:
+            field = field_class.create()
+        else:
+            fields.append(field.copy())
+    return fields
+
+def _drop_benchmark_(field_class):
+    """
+    Drops every orientation of every tetromino in every column of each fixed
+    field, copying the field before each drop like the strategy does.
+    """
+    fields = fixed_fields(field_class)
+    drops = [(orientation.tetromino, column)
+             for orientations in ORIENTATIONS.values()
+             for orientation in orientations
+             for column in range(Field.WIDTH - orientation.width + 1)]
+    start = time.perf_counter()
+    for field in fields:
+        for tetromino, column in drops:
+            field.copy().drop(tetromino, column)
+    return len(fields) * len(drops), time.perf_counter() - start
+
+@benchmark('field_drop', 'drops/sec')
+def field_drop(): # pylint: disable=missing-function-docstring
+    return _drop_benchmark_(Field)
+
+@benchmark('bit_field_drop', 'drops/sec')
+def bit_field_drop(): # pylint: disable=missing-function-docstring
+    return _drop_benchmark_(BitField)
+
+def _place_undo_benchmark_(field_class):
+    """
+    Makes the same drops as _drop_benchmark_(), but places and undoes each of
+    them on the fixed field itself instead of dropping it in a copy.
+    """
+    fields = fixed_fields(field_class)
+    drops = [(orientation.tetromino, column)
+             for orientations in ORIENTATIONS.values()
+             for orientation in orientations
+             for column in range(Field.WIDTH - orientation.width + 1)]
+    start = time.perf_counter()
+    for field in fields:
+        for tetromino, column in drops:
+            if (record := field.place(tetromino, column)[1]) is not None:
+                field.undo(record)
+    return len(fields) * len(drops), time.perf_counter() - start
+
+@benchmark('field_place_undo', 'drops/sec')
+def field_place_undo(): # pylint: disable=missing-function-docstring
+    return _place_undo_benchmark_(Field)
+
+@benchmark('bit_field_place_undo', 'drops/sec')
+def bit_field_place_undo(): # pylint: disable=missing-function-docstring
+    return _place_undo_benchmark_(BitField)
+
+def _placements_benchmark_(field_class):
+    """
+    Generates every placement of every tetromino on each fixed field.
+    """
+    fields = fixed_fields(field_class)
+    start = time.perf_counter()
+    n_placements = 0
+    for field in fields:
+        for orientations in ORIENTATIONS.values():
+            n_placements += len(field.placements(orientations)[0])
+    return n_placements, time.perf_counter() - start
+
+@benchmark('field_placements', 'placements/sec')
+def field_placements(): # pylint: disable=missing-function-docstring
+    return _placements_benchmark_(Field)
+
+@benchmark('bit_field_placements', 'placements/sec')
+def bit_field_placements(): # pylint: disable=missing-function-docstring
+    return _placements_benchmark_(BitField)
+
+@benchmark('field_score', 'evaluations/sec')
+def field_score(): # pylint: disable=missing-function-docstring
+    # pylint: disable=protected-access
+    chromosome = TetrisChromosome.create(GENES)
+    fields = fixed_fields(Field) * 8
+    start = time.perf_counter()
+    for field in fields:
+        chromosome._get_field_score_(field)
+    return len(fields), time.perf_counter() - start
+
+@benchmark('batched_field_scores', 'evaluations/sec')
+def batched_field_scores(): # pylint: disable=missing-function-docstring
+    # pylint: disable=protected-access
+    chromosome = TetrisChromosome.create(GENES)
+    boards = np.array([field.state != 0 for field in fixed_fields(Field)] * 8)
+    start = time.perf_counter()
+    for _ in range(8):
+        chromosome._get_field_scores_(boards)
+    return 8 * len(boards), time.perf_counter() - start
+
+def _feature_benchmark_(names):
+    """
+    Returns a benchmark computing the features with the given names for every
+    placement of every tetromino on each fixed field. If any of them needs
+    the moves leading to the fields, computing those from the placed
+    tetrominos is timed as well, as that is where their cost lies.
+    """
+    def run_benchmark():
+        fields = np.array([field.state != 0
+                           for field in fixed_fields(Field)])
+        placed, cell_rows = place_all(
+            np.repeat(fields, len(ORIENTATIONS), axis=0),
+            list(ORIENTATIONS) * len(fields))[2:]
+        boards = Field.clear_lines(placed)[0]
+        extractor = FeatureExtractor.create(names)
+        start = time.perf_counter()
+        for _ in range(8):
+            extractor.values(boards, Field.placement_moves(
+                placed, cell_rows) if extractor.needs_moves else None)
+        return 8 * len(boards), time.perf_counter() - start
+    return run_benchmark
+
+for _name in FEATURES:
+    benchmark(f'feature_{_name}', 'boards/sec')(_feature_benchmark_([_name]))
+benchmark('all_features', 'boards/sec')(_feature_benchmark_(FEATURES))
+
+@benchmark('strategy_callback', 'moves/sec')
+def strategy_callback(): # pylint: disable=missing-function-docstring
+    chromosome = TetrisChromosome.create(GENES)
+    fields = fixed_fields(BitField)
+    start = time.perf_counter()
+    for field in fields:
+        for tetromino in TetrisDriver.TETROMINOS:
+            chromosome.strategy_callback(field, tetromino, None)
+    return len(fields) * len(TetrisDriver.TETROMINOS), \
+        time.perf_counter() - start
+
+@benchmark('hold_strategy_callback', 'moves/sec')
+def hold_strategy_callback(): # pylint: disable=missing-function-docstring
+    chromosome = TetrisChromosome.create(GENES, hold=True)
+    fields = fixed_fields(BitField)
+    tetrominos = TetrisDriver.TETROMINOS
+    start = time.perf_counter()
+    for field in fields:
+        for i, tetromino in enumerate(tetrominos):
+            chromosome.strategy_callback(field, tetromino, tetrominos[i - 1])
+    return len(fields) * len(tetrominos), time.perf_counter() - start
+
+def _lookahead_benchmark_(search_depth):
+    """
+    Chooses a move for every tetromino on each fixed field, looking ahead at
+    the tetrominos following it with the given search depth.
+    """
+    chromosome = TetrisChromosome.create(GENES, search_depth=search_depth)
+    fields = fixed_fields(BitField)
+    tetrominos = TetrisDriver.TETROMINOS
+    start = time.perf_counter()
+    for field in fields:
+        for i, tetromino in enumerate(tetrominos):
+            chromosome.strategy_callback(field, tetromino, None,
+                                         (tetrominos * 2)[i + 1:i + 3])
+    return len(fields) * len(tetrominos), time.perf_counter() - start
+
+@benchmark('lookahead_2', 'moves/sec')
+def lookahead_2(): # pylint: disable=missing-function-docstring
+    return _lookahead_benchmark_(2)
+
+@benchmark('lookahead_3', 'moves/sec')
+def lookahead_3(): # pylint: disable=missing-function-docstring
+    return _lookahead_benchmark_(3)
+
+@benchmark('cached_strategy_callback', 'moves/sec')
+def cached_strategy_callback(): # pylint: disable=missing-function-docstring
+    chromosome = TetrisChromosome.create(GENES)
+    fields = fixed_fields(BitField)
+    TetrisChromosome.evaluation_cache = EvaluationCache(1 << 16)
+    try:
+        start = time.perf_counter()
+        # Every field is evaluated twice, so that half of the lookups hit.
+        for _ in range(2):
+            for field in fields:
+                for tetromino in TetrisDriver.TETROMINOS:
+                    chromosome.strategy_callback(field, tetromino, None)
+        elapsed = time.perf_counter() - start
+    finally:
+        TetrisChromosome.evaluation_cache = None
+    return 2 * len(fields) * len(TetrisDriver.TETROMINOS), elapsed
+
+@benchmark('tetris_driver', 'games/sec')
+def tetris_driver(): # pylint: disable=missing-function-docstring
+    chromosome = TetrisChromosome.create(GENES, n_simulations=8,
+                                         max_simulation_length=100)
+    start = time.perf_counter()
+    chromosome.simulate(seed=0)
+    return chromosome.n_simulations, time.perf_counter() - start
+
+@benchmark('batch_tetris_driver', 'games/sec')
+def batch_tetris_driver(): # pylint: disable=missing-function-docstring
+    chromosomes = [TetrisChromosome.create(
+        GENES, n_simulations=8, max_simulation_length=100)
+                   for _ in range(8)]
+    start = time.perf_counter()
+    TetrisChromosome.simulate_all(chromosomes, range(len(chromosomes)))
+    return 8 * len(chromosomes), time.perf_counter() - start
+
+@benchmark('recorded_batch_tetris_driver', 'games/sec')
+def recorded_batch_tetris_driver(): # pylint: disable=missing-function-docstring
+    chromosomes = [TetrisChromosome.create(
+        GENES, n_simulations=8, max_simulation_length=100)
+                   for _ in range(8)]
+    with tempfile.TemporaryDirectory() as directory:
+        TetrisChromosome.game_recorder = GameRecorder.create(
+            os.path.join(directory, 'games'))
+        try:
+            start = time.perf_counter()
+            TetrisChromosome.simulate_all(chromosomes, range(len(chromosomes)))
+            elapsed = time.perf_counter() - start
+        finally:
+            TetrisChromosome.game_recorder.close()
+            TetrisChromosome.game_recorder = None
+    return 8 * len(chromosomes), elapsed
+
+@benchmark('replay_field_at', 'fields/sec')
+def replay_field_at(): # pylint: disable=missing-function-docstring
+    chromosome = TetrisChromosome.create(GENES)
+    record = GameRecord.create(seed=0)
+    driver = TetrisDriver.create(BitField.create(), PieceSource.create(seed=0),
+                                 record=record)
+    while driver.play(chromosome.strategy_callback) and \
+            driver.num_placed < 500:
+        pass
+    record = GameRecord.from_bytes(record.to_bytes())[0]
+    start = time.perf_counter()
+    for n_moves in range(len(record) + 1):
+        record.field_at(n_moves)
+    return len(record) + 1, time.perf_counter() - start
+
+@benchmark('population_run', 'sec/generation', higher_is_better=False)
+def population_run(): # pylint: disable=missing-function-docstring
+    random.seed(0)
+    np.random.seed(0)
+    population = Population([TetrisChromosome.random(
+        n_simulations=2, max_simulation_length=100) for _ in range(8)])
+    generations = 2
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        population.run(generations)
+    return generations, time.perf_counter() - start
+
+@benchmark('steady_state_run', 'sec/generation', higher_is_better=False)
+def steady_state_run(): # pylint: disable=missing-function-docstring
+    random.seed(0)
+    np.random.seed(0)
+    population = Population([TetrisChromosome.random(
+        n_simulations=2, max_simulation_length=100) for _ in range(8)],
+                            steady_state=True)
+    generations = 2
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        population.run(generations)
+    return generations, time.perf_counter() - start
+
+@benchmark('population_breeding', 'chromosomes/sec')
+def population_breeding(): # pylint: disable=missing-function-docstring
+    # pylint: disable=protected-access
+    random.seed(0)
+    np.random.seed(0)
+    population = Population([TetrisChromosome.random()
+                             for _ in range(4096)])
+    fitness = np.random.random_sample(len(population.population)) * 100
+    generations = 8
+    start = time.perf_counter()
+    for _ in range(generations):
+        population._breed_(fitness)
+    return generations * len(fitness), time.perf_counter() - start
+
+def run(names=None, repeat=3):
+    """
+    Runs the named benchmarks, or all of them, repeat times each, and returns
+    a dict mapping each benchmark name to its best result.
+    """
+    results = {}
+    for name in names or BENCHMARKS:
+        function, unit, higher_is_better = BENCHMARKS[name]
+        values = []
+        for _ in range(repeat):
+            count, seconds = function()
+            values.append(count / seconds if higher_is_better else
+                          seconds / count)
+        results[name] = {
+            'value': max(values) if higher_is_better else min(values),
+            'unit': unit,
+            'higher_is_better': higher_is_better,
+        }
+    return results
+
+def compare(results, baseline, tolerance):
+    """
+    Compares benchmark results against baseline results, returning a list of
+    (name, baseline value, value, relative change, is regression) tuples for
+    the benchmarks present in both. A relative change is positive when the
+    result improved, and a regression is a change worse than the tolerance.
+    """
+    comparison = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        base, value = baseline[name]['value'], result['value']
+        change = (value - base) / base
+        if not result['higher_is_better']:
+            change = -change
+        comparison.append((name, base, value, change, change < -tolerance))
+    return comparison
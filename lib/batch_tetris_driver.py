@@ -0,0 +1,177 @@
+"""
+BatchTetrisDriver plays many games of Tetris in lockstep, holding every field
+in a single np array so that each step of every game is advanced together with
+array operations.
+"""
+
+import numpy as np
+
+from lib.field import Field
+from lib.move_table import CELL_COLS, CELL_ROWS, ENDS, HEIGHTS, PLACEMENTS, \
+    STARTS, landing_rows, scan_drop_rows
+
+def place_all(fields, tetromino_types):
+    """
+    Places every placement of each given tetromino type in the corresponding
+    field of a (n, HEIGHT, WIDTH) boolean np array of fields. Returns the
+    index of the field and the PLACEMENTS index of each placement, the
+    (n_placements, HEIGHT, WIDTH) np array of the fields with the tetromino
+    placed but no lines cleared yet, grouped by field in order, and the
+    (n_placements, 4) np array of the row of every space of each tetromino.
+    """
+    ids = np.concatenate([
+        np.arange(STARTS[tetromino_type], ENDS[tetromino_type])
+        for tetromino_type in tetromino_types])
+    owners = np.repeat(np.arange(len(fields)), [
+        ENDS[tetromino_type] - STARTS[tetromino_type]
+        for tetromino_type in tetromino_types])
+    heights = np.where(fields.any(axis=1),
+                       Field.HEIGHT - fields.argmax(axis=1), 0)
+    rows = landing_rows(heights, owners, ids)
+    # Fall back to scanning when the stack reaches the rows the tetromino
+    # enters the field at, to match Field exactly.
+    if (near_top := np.flatnonzero(rows < HEIGHTS[ids])).size:
+        rows[near_top] = scan_drop_rows(fields[owners[near_top]],
+                                        ids[near_top])
+    valid = rows >= 0
+    ids, owners, rows = ids[valid], owners[valid], rows[valid]
+    placed = fields[owners]
+    cell_rows = rows[:, np.newaxis] + CELL_ROWS[ids]
+    placed[np.arange(len(ids))[:, np.newaxis], cell_rows, CELL_COLS[ids]] = True
+    return owners, ids, placed, cell_rows
+
+def batch_placements(fields, tetromino_types, moves=False):
+    """
+    Computes the fields resulting from every placement of each given tetromino
+    type in the corresponding field of a (n, HEIGHT, WIDTH) boolean np array of
+    fields. Returns the index of the field and the PLACEMENTS index of each
+    placement along with the number of lines it cleared, and a
+    (n_placements, HEIGHT, WIDTH) np array of the resulting fields, grouped by
+    field in order. If moves is True, the moves of the placements, as returned
+    by Field.placement_moves(), are returned as well.
+    """
+    owners, ids, placed, cell_rows = place_all(fields, tetromino_types)
+    boards, lines_cleared = Field.clear_lines(placed)
+    if moves:
+        return owners, ids, lines_cleared, boards, \
+            Field.placement_moves(placed, cell_rows)
+    return owners, ids, lines_cleared, boards
+
+def group_argmin(groups, values):
+    """
+    Given a sorted np array of group indices and an np array of values of the
+    same length, returns the index of the smallest value in each group, in
+    order of the groups. Ties are broken in favor of the earliest index.
+    """
+    order = np.lexsort((values, groups))
+    firsts = np.ones(len(groups), dtype=bool)
+    firsts[1:] = groups[order[1:]] != groups[order[:-1]]
+    return order[firsts]
+
+class BatchTetrisDriver(): # pylint: disable=missing-class-docstring
+
+    def __init__(self, fields, pieces, max_placed, held_types=None,
+                 records=None):
+        self.fields = fields
+        self.pieces = pieces
+        self.max_placed = max_placed
+        self.held_types = held_types
+        self.records = records
+        self.active = np.ones(len(fields), dtype=bool)
+        self.num_placed = np.zeros(len(fields), dtype=np.int64)
+        self.lines_cleared = np.zeros(len(fields), dtype=np.int64)
+
+    @staticmethod
+    def create(pieces, max_placed=None, hold=False, records=None):
+        """
+        Factory method to create a BatchTetrisDriver playing one game per given
+        PieceSource, which deals the tetrominos of its game. If max_placed is
+        given, as a single number or one per game, each game ends once that
+        many tetrominos have been placed. If hold is True, every game has a
+        held tetromino which works the same way as in TetrisDriver. If a
+        GameRecord is given for every game, each game is recorded into its
+        own.
+        """
+        n_games = len(pieces)
+        if max_placed is None:
+            max_placed = np.iinfo(np.int64).max
+        held_types = [source.next().type() for source in pieces] if hold \
+            else None
+        if records is not None and hold:
+            for record, held_type in zip(records, held_types):
+                record.deal(held_type)
+        return BatchTetrisDriver(
+            np.zeros((n_games, Field.HEIGHT, Field.WIDTH), dtype=bool),
+            pieces, np.broadcast_to(max_placed, n_games), held_types, records)
+
+    def _hold_slots_(self, games, tetromino_types):
+        """
+        Given the games in progress and their next tetromino types, returns
+        the game and tetromino type of every tetromino each game may play,
+        which is its next tetromino followed by its held tetromino if that is
+        of a different type. Also returns, for each of them, the tetromino type
+        which goes in the hold if it is played, or None.
+        """
+        slots = []
+        for game, next_type in zip(games, tetromino_types):
+            slots.append((game, next_type, None))
+            if (held_type := self.held_types[game]) != next_type:
+                slots.append((game, held_type, next_type))
+        games, tetromino_types, swaps = zip(*slots)
+        return np.array(games), list(tetromino_types), swaps
+
+    def _record_moves_(self, games, ids, lines_cleared):
+        """
+        Records the placement with the given PLACEMENTS index and number of
+        lines cleared played in each of the given games.
+        """
+        for game, placement, lines in zip(games, ids, lines_cleared.tolist()):
+            orientation, column = PLACEMENTS[placement]
+            self.records[game].move(orientation.tetromino.type(),
+                                    orientation.rotation, column, lines,
+                                    self.fields[game])
+
+    def play(self, strategy, moves=False):
+        """
+        Draws the next tetromino of every game still in progress and plays the
+        placement chosen by the given strategy callback in each of them.
+
+        The strategy is called with the game index of every possible
+        placement, grouped by game in increasing order, and the
+        (n_placements, HEIGHT, WIDTH) np array of the fields resulting from
+        them, followed by their moves if moves is True, and must return the
+        index of the chosen placement for each of those games. Placements of
+        the held tetromino of a game follow those of its next tetromino, unless
+        they are the same type. A game is over when its tetromino cannot be
+        placed or it has placed max_placed tetrominos.
+        Returns whether any game is still in progress.
+        """
+        games = np.flatnonzero(self.active)
+        if len(games) == 0:
+            return False
+        tetromino_types = [self.pieces[game].next().type() for game in games]
+        if self.records is not None:
+            for game, tetromino_type in zip(games, tetromino_types):
+                self.records[game].deal(tetromino_type)
+        if self.held_types is not None:
+            games, tetromino_types, swaps = self._hold_slots_(
+                games, tetromino_types)
+        local_owners, ids, lines_cleared, boards, *placement_moves = \
+            batch_placements(self.fields[games], tetromino_types, moves)
+        owners = games[local_owners]
+        self.active[games] = False
+        if len(owners):
+            chosen = strategy(owners, boards, *placement_moves)
+            if self.held_types is not None:
+                for slot in local_owners[chosen]:
+                    if swaps[slot] is not None:
+                        self.held_types[games[slot]] = swaps[slot]
+            playing = owners[chosen]
+            self.fields[playing] = boards[chosen]
+            self.num_placed[playing] += 1
+            self.lines_cleared[playing] += lines_cleared[chosen]
+            if self.records is not None:
+                self._record_moves_(playing, ids[chosen], lines_cleared[chosen])
+            self.active[playing] = self.num_placed[playing] < \
+                self.max_placed[playing]
+        return bool(self.active.any())
@@ -0,0 +1,200 @@
+"""
+The BitField class is an alternate representation of the Tetris game field
+which stores each row as an integer bitmask. It exposes the same interface as
+Field, so it can be swapped in wherever a Field is used.
+"""
+
+import numpy as np
+
+from lib.field import Field
+from lib.move_table import CELL_ROWS, HEIGHTS, PLACEMENTS, ROW_BITS, \
+    ROW_MASKS, landing_rows, orientation_ids, scan_drop_rows_bits
+
+class BitField(Field): # pylint: disable=missing-class-docstring
+
+    FULL_ROW = (1 << Field.WIDTH) - 1
+    COLUMN_BITS = 1 << np.arange(Field.WIDTH)
+    # Rows only record which spaces are filled, not by which tetromino.
+    CHARS = np.array([' ', '#'])
+
+    def __init__(self, rows, column_heights=None, column_gaps=None,
+                 totals=None):
+        # pylint: disable=super-init-not-called
+        """
+        Initializes a BitField. Rows increase downward, and bit i of each row
+        is set if column i of that row is filled. Invoke BitField.create()
+        instead.
+        """
+        self.rows = rows
+        self._init_columns_(column_heights, column_gaps, totals)
+
+    @staticmethod
+    def create(state=None):
+        """
+        Factory method to create a BitField object, with an optional input
+        state np array parameter in the same format that Field accepts. If the
+        input state is not valid, then this method returns None. The tetromino
+        types of the filled spaces are not preserved.
+        """
+        if state is not None:
+            if state.shape == (Field.HEIGHT, Field.WIDTH):
+                return BitField(
+                    ((state != 0) @ BitField.COLUMN_BITS).tolist())
+            return None
+        return BitField([0] * Field.HEIGHT)
+
+    @property
+    def state(self):
+        """
+        Returns the field as a np array of 0s and 1s, where 1 is a filled
+        space.
+        """
+        return ((np.array(self.rows)[:, np.newaxis] &
+                 BitField.COLUMN_BITS) != 0).astype(np.uint8)
+
+    @staticmethod
+    def _tetromino_masks_(tetromino, column):
+        """
+        Returns a list of the row bitmasks of a tetromino whose leftmost column
+        is aligned with the specified column.
+        """
+        return [mask << column for mask in tetromino.orientation().row_masks]
+
+    def _test_tetromino_(self, tetromino, r_start, c_start):
+        """
+        Tests to see if a tetromino can be placed at the specified row and
+        column. It performs the test with the top left corner of the
+        tetromino at the specified row and column.
+        """
+        if c_start < 0 or c_start + tetromino.width() > Field.WIDTH:
+            return False
+        if r_start < 0 or r_start + tetromino.height() > Field.HEIGHT:
+            return False
+        for row, mask in zip(self.rows[r_start:], BitField._tetromino_masks_(
+                tetromino, c_start)):
+            if row & mask:
+                return False
+        return True
+
+    def _place_tetromino_(self, tetromino, r_start, c_start):
+        """
+        Place a tetromino at the specified row and column. The top left corner
+        of the tetromino will be placed at the specified row and column.
+        This function only performs boundary checks and will overwrite filled
+        spaces in the field.
+        """
+        assert c_start >= 0 and c_start + tetromino.width() <= Field.WIDTH
+        assert r_start >= 0 and r_start + tetromino.height() <= Field.HEIGHT
+        for i, mask in enumerate(
+                BitField._tetromino_masks_(tetromino, c_start), r_start):
+            self.rows[i] |= mask
+
+    def _compute_heights_(self):
+        """
+        Computes the height of every column from the field state.
+        """
+        heights = [0] * Field.WIDTH
+        seen = 0
+        for i, row in enumerate(self.rows):
+            if new := row & ~seen:
+                seen |= new
+                for column in range(Field.WIDTH):
+                    if new >> column & 1:
+                        heights[column] = Field.HEIGHT - i
+                if seen == BitField.FULL_ROW:
+                    break
+        return heights
+
+    def _column_height_(self, column):
+        """
+        Computes the height of the given column from the field state.
+        """
+        for i, row in enumerate(self.rows):
+            if row >> column & 1:
+                return Field.HEIGHT - i
+        return 0
+
+    def _column_gaps_(self, column):
+        """
+        Counts the empty spaces below the highest filled space of the given
+        column from the field state.
+        """
+        return self._column_height_(column) - sum(
+            row >> column & 1 for row in self.rows)
+
+    def _line_clear_(self):
+        """
+        Checks and removes all filled lines, returning the number of lines
+        cleared.
+        """
+        if BitField.FULL_ROW not in self.rows:
+            return 0
+        cleared_rows = {i for i, row in enumerate(self.rows)
+                        if row == BitField.FULL_ROW}
+        n_filled = len(cleared_rows)
+        self.rows = [0] * n_filled + [
+            row for row in self.rows if row != BitField.FULL_ROW]
+        self._clear_columns_(cleared_rows)
+        return n_filled
+
+    def _full_rows_(self, r_start, r_end):
+        """
+        Returns the indices of the filled lines between the specified rows.
+        """
+        return [row for row in range(r_start, r_end)
+                if self.rows[row] == BitField.FULL_ROW]
+
+    def _save_rows_(self, r_start, r_end):
+        """
+        Returns a copy of the rows between the specified rows, for undoing.
+        """
+        return self.rows[r_start:r_end]
+
+    def _restore_rows_(self, r_start, saved_rows, cleared_rows):
+        """
+        Restores the rows saved by _save_rows_() in the same way as
+        Field._restore_rows_().
+        """
+        if cleared_rows:
+            kept = iter(self.rows[len(cleared_rows):])
+            self.rows = [BitField.FULL_ROW if row in cleared_rows
+                         else next(kept) for row in range(Field.HEIGHT)]
+        self.rows[r_start:r_start + len(saved_rows)] = saved_rows
+
+    def placements(self, orientations, moves=False):
+        """
+        Computes the fields resulting from dropping each of the given
+        Orientations in every column it fits in, and optionally their moves,
+        in the same way as Field.placements(), but entirely from the move
+        table: the landing rows come from the cached column heights,
+        collisions near the top from the row bitmasks, and the resulting
+        fields are built as row bitmasks and expanded with ROW_BITS.
+        """
+        ids = orientation_ids(orientations)
+        rows = landing_rows(np.array([self.column_heights]),
+                            np.zeros(len(ids), dtype=np.int64), ids)
+        if (near_top := np.flatnonzero(rows < HEIGHTS[ids])).size:
+            rows[near_top] = scan_drop_rows_bits(self.rows, ids[near_top])
+        valid = rows >= 0
+        ids, rows = ids[valid], rows[valid]
+        field_rows = np.repeat(np.array([self.rows]), len(ids), axis=0)
+        placed = np.arange(len(ids))
+        for i in range(4):
+            # Each row of a placement is ored in separately, as fancy indexed
+            # assignments do not accumulate over repeated indices.
+            has_row = i < HEIGHTS[ids]
+            field_rows[placed[has_row], rows[has_row] + i] |= \
+                ROW_MASKS[ids[has_row], i]
+        boards = ROW_BITS[field_rows]
+        if moves:
+            return [PLACEMENTS[i] for i in ids], Field.clear_lines(boards)[0], \
+                Field.placement_moves(boards, rows[:, np.newaxis] +
+                                      CELL_ROWS[ids])
+        return [PLACEMENTS[i] for i in ids], Field.clear_lines(boards)[0]
+
+    def copy(self):
+        """
+        Returns a copy of the field.
+        """
+        return BitField(self.rows.copy(), self.column_heights.copy(),
+                        self.column_gaps.copy(), self._totals_())
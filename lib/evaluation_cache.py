@@ -0,0 +1,63 @@
+"""
+The EvaluationCache class is a bounded least recently used cache for values
+computed from fields, such as the input data points a strategy scores a field
+with.
+"""
+
+import collections
+
+class EvaluationCache(): # pylint: disable=missing-class-docstring
+
+    def __init__(self, maxsize):
+        """
+        Initializes an EvaluationCache holding at most maxsize entries. Once it
+        is full, the least recently used entry is evicted to make room.
+        """
+        assert maxsize > 0
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __str__(self):
+        """
+        Returns a string representation of the cache's usage.
+        """
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0
+        return (f'Size: {len(self)}/{self.maxsize} \t Hits: {self.hits} \t '
+                f'Misses: {self.misses} \t Hit rate: {hit_rate:.2%}')
+
+    def get(self, key):
+        """
+        Returns the value cached for the given key, or None if there is none,
+        marking the entry as the most recently used.
+        """
+        value = self.entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        """
+        Caches a value for the given key, evicting the least recently used
+        entry if the cache is full.
+        """
+        self.entries[key] = value
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Removes every entry from the cache and resets its counters.
+        """
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
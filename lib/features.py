@@ -0,0 +1,231 @@
+"""
+Features are the input data points a strategy scores fields with. Every
+feature is registered under a name, and a FeatureExtractor computes any
+selection of them for a whole (n, HEIGHT, WIDTH) boolean np array of fields in
+one vectorized pass. Intermediate arrays such as the column heights are shared
+between the features which use them, so each is computed at most once per
+pass.
+
+Most features only depend on the resulting fields. Features which describe the
+placement that led to each field, such as its landing height, also need the
+moves returned by the placement functions when they are asked for them.
+
+A single Field keeps its column heights and gap and bumpiness totals up to
+date as tetrominos are dropped, so features which can be read from those also
+register a field function, which FeatureExtractor.field_values() uses instead
+of the vectorized pass.
+"""
+
+import functools
+import math
+
+import numpy as np
+
+from lib.field import Field
+
+# Maps the name of each feature to the function computing it and whether it
+# needs the moves which led to each field.
+FEATURES = {}
+
+# Maps the name of each feature which can be computed from the cached columns
+# of a single Field to the function computing it.
+FIELD_FEATURES = {}
+
+# The features TetrisChromosomes have always been scored with.
+DEFAULT_FEATURES = ('gaps', 'mean_height', 'height_std', 'height_range',
+                    'max_step')
+
+def feature(name, needs_moves=False, field=None):
+    """
+    Decorator registering a feature function under the given name. The
+    function takes a Boards and returns a (n,) np array of the value of the
+    feature for each field. If given, the field function computes the same
+    value for a single Field from the Field and the list of its column
+    heights, in plain Python, which is faster than numpy on so few values.
+    """
+    def register(function):
+        FEATURES[name] = (function, needs_moves)
+        if field is not None:
+            FIELD_FEATURES[name] = field
+        return function
+    return register
+
+class Boards(): # pylint: disable=missing-class-docstring
+
+    def __init__(self, boards, moves=None):
+        """
+        Initializes the intermediate arrays of a (n, HEIGHT, WIDTH) boolean np
+        array of fields, and optionally the moves which led to them, which
+        are computed when first used.
+        """
+        self.boards = boards
+        self.moves = moves
+
+    @functools.cached_property
+    def heights(self):
+        """
+        The (n, WIDTH) np array of the height of every column.
+        """
+        return np.where(self.boards.any(axis=1),
+                        Field.HEIGHT - self.boards.argmax(axis=1), 0)
+
+    @functools.cached_property
+    def steps(self):
+        """
+        The (n, WIDTH - 1) np array of the height differences of adjacent
+        columns.
+        """
+        return np.diff(self.heights, axis=1)
+
+    @functools.cached_property
+    def wall_heights(self):
+        """
+        The (n, WIDTH + 2) np array of the height of every column, with the
+        walls on either side as full columns.
+        """
+        walls = np.full((len(self.boards), 1), Field.HEIGHT)
+        return np.hstack([walls, self.heights, walls])
+
+@feature('gaps', field=lambda field, _: field.total_gaps)
+def gaps(boards): # pylint: disable=missing-function-docstring
+    return boards.heights.sum(axis=1) - np.count_nonzero(
+        boards.boards, axis=(1, 2))
+
+@feature('mean_height',
+         field=lambda field, _: field.total_height / Field.WIDTH)
+def mean_height(boards): # pylint: disable=missing-function-docstring
+    return boards.heights.mean(axis=1)
+
+@feature('height_std', field=lambda field, heights: math.sqrt(max(
+    sum(height * height for height in heights) / Field.WIDTH -
+    (field.total_height / Field.WIDTH) ** 2, 0)))
+def height_std(boards): # pylint: disable=missing-function-docstring
+    return boards.heights.std(axis=1)
+
+@feature('height_range', field=lambda _, heights: max(heights) - min(heights))
+def height_range(boards): # pylint: disable=missing-function-docstring
+    return boards.heights.max(axis=1) - boards.heights.min(axis=1)
+
+@feature('max_step', field=lambda _, heights: max(
+    abs(left - right) for left, right in zip(heights, heights[1:])))
+def max_step(boards): # pylint: disable=missing-function-docstring
+    return np.abs(boards.steps).max(axis=1)
+
+@feature('max_height', field=lambda _, heights: max(heights))
+def max_height(boards): # pylint: disable=missing-function-docstring
+    return boards.heights.max(axis=1)
+
+@feature('bumpiness', field=lambda field, _: field.total_bumpiness)
+def bumpiness(boards): # pylint: disable=missing-function-docstring
+    return np.abs(boards.steps).sum(axis=1)
+
+@feature('row_transitions')
+def row_transitions(boards):
+    """
+    The number of horizontally adjacent spaces, counting the walls as filled,
+    where one is filled and the other is empty.
+    """
+    rows = boards.boards
+    return (rows[:, :, 1:] != rows[:, :, :-1]).sum(axis=(1, 2)) + \
+        (~rows[:, :, 0]).sum(axis=1) + (~rows[:, :, -1]).sum(axis=1)
+
+@feature('column_transitions')
+def column_transitions(boards):
+    """
+    The number of vertically adjacent spaces, counting the floor as filled,
+    where one is filled and the other is empty.
+    """
+    columns = boards.boards
+    return (columns[:, 1:] != columns[:, :-1]).sum(axis=(1, 2)) + \
+        (~columns[:, -1]).sum(axis=1)
+
+@feature('wells')
+def wells(boards):
+    """
+    The sum over every column lower than both of its neighbors, counting the
+    walls as full columns, of 1 + 2 + ... + its depth, so that deep wells
+    weigh more than several shallow ones.
+    """
+    heights = boards.wall_heights
+    depths = np.maximum(np.minimum(heights[:, :-2], heights[:, 2:]) -
+                        heights[:, 1:-1], 0)
+    return (depths * (depths + 1) // 2).sum(axis=1)
+
+@feature('landing_height', needs_moves=True)
+def landing_height(boards):
+    """
+    The height of the middle of the tetromino placed to reach each field.
+    """
+    return boards.moves['landing_height']
+
+@feature('eroded_cells', needs_moves=True)
+def eroded_cells(boards):
+    """
+    The number of lines cleared by the placement which reached each field,
+    times the number of spaces of the placed tetromino that were cleared.
+    """
+    return boards.moves['eroded_cells']
+
+class FeatureExtractor(): # pylint: disable=missing-class-docstring
+
+    # Every FeatureExtractor created, by the names of its features.
+    EXTRACTORS = {}
+
+    def __init__(self, names):
+        """
+        Initializes a FeatureExtractor computing the features with the given
+        names, in order. Invoke FeatureExtractor.create() instead.
+        """
+        self.names = names
+        self.functions = [FEATURES[name][0] for name in names]
+        self.needs_moves = any(FEATURES[name][1] for name in names)
+        self.field_functions = [FIELD_FEATURES[name] for name in names] if \
+            all(name in FIELD_FEATURES for name in names) else None
+
+    @staticmethod
+    def create(names=DEFAULT_FEATURES):
+        """
+        Factory method returning the FeatureExtractor computing the features
+        with the given names, in order, which is only created once. Raises a
+        ValueError if a feature does not exist.
+        """
+        names = tuple(names)
+        if (extractor := FeatureExtractor.EXTRACTORS.get(names)) is None:
+            for name in names:
+                if name not in FEATURES:
+                    raise ValueError('No feature named {}'.format(name))
+            extractor = FeatureExtractor(names)
+            FeatureExtractor.EXTRACTORS[names] = extractor
+        return extractor
+
+    def __len__(self):
+        """
+        Returns the number of features computed.
+        """
+        return len(self.names)
+
+    def values(self, boards, moves=None):
+        """
+        Computes the features of every field in a (n, HEIGHT, WIDTH) boolean
+        np array of fields, given the moves which led to them if any feature
+        needs them, returning them as a (n, len(self)) np array.
+        """
+        if self.needs_moves and moves is None:
+            raise ValueError('The features {} need moves'.format(self.names))
+        context = Boards(boards, moves)
+        return np.column_stack([function(context).astype(np.float64)
+                                for function in self.functions])
+
+    def field_values(self, field):
+        """
+        Computes the features of a single Field, which must not need moves,
+        returning them as a (len(self),) np array. They are read from the
+        cached columns of the Field when every feature supports it, and
+        computed like values() otherwise.
+        """
+        if self.field_functions is None:
+            return self.values((field.state != 0)[np.newaxis])[0]
+        heights = field.column_heights
+        return np.array([function(field, heights)
+                         for function in self.field_functions],
+                        dtype=np.float64)
@@ -3,6 +3,8 @@ The Field class encapsulates the Tetris game field and the logic to place and
 drop tetrominoes within it.
 """
 
+import operator
+
 import numpy as np
 
 from lib.tetromino import Tetromino
@@ -13,13 +15,56 @@ class Field(): # pylint: disable=missing-class-docstring
     HEIGHT = 22
     SCORING_ELEMENTS = 6
 
-    def __init__(self, state):
+    # The character each value of the field state is drawn as.
+    CHARS = np.array(Tetromino.TYPES)
+
+    def __init__(self, state, column_heights=None, column_gaps=None,
+                 totals=None):
         """
         Initializes a Tetris Field. Rows increase downward and columns increase
-        to the right in the np array representation. Invoke Field.create()
-        instead.
+        to the right in the np array representation. The height and gap count
+        of each column are cached and kept up to date as tetrominoes are
+        dropped. Invoke Field.create() instead.
         """
         self.state = state
+        self._init_columns_(column_heights, column_gaps, totals)
+
+    def _init_columns_(self, column_heights, column_gaps, totals):
+        """
+        Sets the cached height and gap count of each column, along with the
+        totals derived from them, computing whichever are not given.
+        """
+        self.column_heights = self._compute_heights_() if \
+            column_heights is None else column_heights
+        self.column_gaps = [
+            self._column_gaps_(column) for column in range(Field.WIDTH)] if \
+            column_gaps is None else column_gaps
+        if totals is None:
+            self._total_columns_()
+        else:
+            self.total_height, self.total_gaps, self.total_bumpiness = totals
+
+    def _total_columns_(self):
+        """
+        Recomputes the totals derived from the cached columns.
+        """
+        self.total_height = sum(self.column_heights)
+        self.total_gaps = sum(self.column_gaps)
+        self.total_bumpiness = Field._bumpiness_(self.column_heights)
+
+    def _totals_(self):
+        """
+        Returns the totals derived from the cached columns, for copying.
+        """
+        return self.total_height, self.total_gaps, self.total_bumpiness
+
+    @staticmethod
+    def _bumpiness_(heights):
+        """
+        Returns the sum of the absolute differences between adjacent heights in
+        the given list.
+        """
+        return sum(map(abs, map(operator.sub, heights, heights[1:])))
 
     @staticmethod
     def create(state=None):
@@ -39,7 +84,7 @@ class Field(): # pylint: disable=missing-class-docstring
         Returns a string representation of the field.
         """
         bars = '   |' + ' '.join(map(str, range(Field.WIDTH))) + '|\n'
-        mapped_field = np.vectorize(Tetromino.TYPES.__getitem__)(self.state)
+        mapped_field = self.CHARS[self.state]
         field = '\n'.join(['{:2d} |'.format(i) + ' '.join(row) + '|'
                            for i, row in enumerate(mapped_field)])
         return bars + field + '\n' + bars
@@ -56,11 +101,7 @@ class Field(): # pylint: disable=missing-class-docstring
         if r_start < 0 or r_end > Field.HEIGHT:
             return False
         test_area = self.state[r_start:r_end, c_start:c_end]
-        for test_space, tetromino_space in zip(
-                test_area.flat, tetromino.state.flat):
-            if test_space != 0 and tetromino_space != 0:
-                return False
-        return True
+        return not test_area[tetromino.orientation().filled].any()
 
     def _place_tetromino_(self, tetromino, r_start, c_start):
         """
@@ -72,21 +113,15 @@ class Field(): # pylint: disable=missing-class-docstring
         r_end, c_end = r_start + tetromino.height(), c_start + tetromino.width()
         assert c_start >= 0 and c_end <= Field.WIDTH
         assert r_start >= 0 and r_end <= Field.HEIGHT
-        for tetromino_row, start_row in enumerate(range(r_start, r_end)):
-            for tetromino_col, start_col, in enumerate(range(c_start, c_end)):
-                if tetromino[tetromino_row][tetromino_col] != 0:
-                    self.state[start_row][start_col] = tetromino[
-                        tetromino_row][tetromino_col]
+        np.copyto(self.state[r_start:r_end, c_start:c_end], tetromino.state,
+                  where=tetromino.orientation().filled)
 
-    def _get_tetromino_drop_row_(self, tetromino, column):
+    def _scan_drop_row_(self, tetromino, column):
         """
-        Given a tetromino and a column, returns the row that the top of the
-        tetromino would end up in if it were dropped in that column. This helper
-        also assumes the leftmost column of the tetromino will be aligned with
-        the specified column.
+        Given a tetromino and a column, finds the row that the top of the
+        tetromino would end up in by testing every row from the top of the
+        field downward.
         """
-        if column < 0 or column + tetromino.width() > Field.WIDTH:
-            return -1
         last_fit = -1
         for row in range(tetromino.height(), Field.HEIGHT):
             if self._test_tetromino_(tetromino, row, column):
@@ -95,26 +130,140 @@ class Field(): # pylint: disable=missing-class-docstring
                 return last_fit
         return last_fit
 
+    def _get_tetromino_drop_row_(self, tetromino, column):
+        """
+        Given a tetromino and a column, returns the row that the top of the
+        tetromino would end up in if it were dropped in that column. This helper
+        also assumes the leftmost column of the tetromino will be aligned with
+        the specified column.
+
+        The tetromino comes to rest on whichever column it reaches first, which
+        is found directly from the cached column heights and the bottom offsets
+        of the tetromino. Only when the stack reaches the rows the tetromino
+        enters the field at do we fall back to scanning.
+        """
+        orientation = tetromino.orientation()
+        if column < 0 or column + orientation.width > Field.WIDTH:
+            return -1
+        row = Field.HEIGHT - 1 - max(
+            height + bottom for height, bottom in zip(
+                self.column_heights[column:], orientation.bottoms))
+        if row >= orientation.height:
+            return row
+        return self._scan_drop_row_(tetromino, column)
+
+    def _update_columns_(self, tetromino, r_start, c_start):
+        """
+        Updates the cached columns to account for a tetromino placed with its
+        top left corner at the specified row and column. Only the columns the
+        tetromino covers change, and with them only the bumpiness between those
+        columns and their neighbors. Every column of a tetromino is contiguous,
+        so any space a column grows by that the tetromino does not fill is a
+        new gap.
+        """
+        orientation = tetromino.orientation()
+        heights, gaps = self.column_heights, self.column_gaps
+        c_end = c_start + orientation.width
+        lo, hi = max(c_start - 1, 0), min(c_end + 1, Field.WIDTH)
+        bumpiness = Field._bumpiness_(heights[lo:hi])
+        grown = 0
+        for column, top, bottom in zip(range(c_start, c_end),
+                                       orientation.tops, orientation.bottoms):
+            previous = heights[column]
+            if (height := Field.HEIGHT - r_start - top) > previous:
+                heights[column] = height
+                grown += height - previous
+                gaps[column] += height - previous - (bottom - top + 1)
+            else:
+                gaps[column] -= bottom - top + 1
+        self.total_height += grown
+        self.total_gaps += grown - len(orientation.cells[0])
+        self.total_bumpiness += Field._bumpiness_(heights[lo:hi]) - bumpiness
+
+    def _clear_columns_(self, cleared_rows):
+        """
+        Updates the cached columns after the given rows were cleared. Every
+        cleared row was filled in every column, so a column only needs to be
+        recomputed if its highest filled space was in a cleared row. Otherwise
+        it just loses the cleared rows, none of which were gaps.
+        """
+        n_cleared = len(cleared_rows)
+        for column, height in enumerate(self.column_heights):
+            if Field.HEIGHT - height in cleared_rows:
+                self.column_heights[column] = self._column_height_(column)
+                self.column_gaps[column] = self._column_gaps_(column)
+            else:
+                self.column_heights[column] = height - n_cleared
+        self._total_columns_()
+
+    def _compute_heights_(self):
+        """
+        Computes the height of every column from the field state.
+        """
+        return [self._column_height_(column) for column in range(Field.WIDTH)]
+
+    def _column_height_(self, column):
+        """
+        Computes the height of the given column from the field state.
+        """
+        filled = np.flatnonzero(self.state[:, column])
+        return int(Field.HEIGHT - filled[0]) if len(filled) else 0
+
+    def _column_gaps_(self, column):
+        """
+        Counts the empty spaces below the highest filled space of the given
+        column from the field state.
+        """
+        return self._column_height_(column) - int(
+            np.count_nonzero(self.state[:, column]))
+
     def _line_clear_(self):
         """
         Checks and removes all filled lines, returning the number of lines
         cleared.
         """
-        filled_lines = np.array([row.all() for row in self.state])
+        filled_lines = self.state.all(axis=1)
         if filled_lines.any():
-            n_filled = filled_lines.sum()
-            self.state = np.vstack([
-                np.full((n_filled, Field.WIDTH), 0, dtype=np.uint8),
-                self.state[np.logical_not(filled_lines)],
-            ])
+            # The remaining lines are shifted down within the existing state.
+            n_filled = int(filled_lines.sum())
+            self.state[n_filled:] = self.state[np.logical_not(filled_lines)]
+            self.state[:n_filled] = 0
+            self._clear_columns_(set(np.flatnonzero(filled_lines).tolist()))
             return n_filled
         return 0
 
+    def _full_rows_(self, r_start, r_end):
+        """
+        Returns the indices of the filled lines between the specified rows.
+        """
+        return [row for row, full in enumerate(
+            self.state[r_start:r_end].all(axis=1).tolist(), r_start) if full]
+
+    def _save_rows_(self, r_start, r_end):
+        """
+        Returns a copy of the rows between the specified rows, for undoing.
+        """
+        return self.state[r_start:r_end].copy()
+
+    def _restore_rows_(self, r_start, saved_rows, cleared_rows):
+        """
+        Restores the rows saved by _save_rows_() before a tetromino was placed
+        in them and the lines at the given indices were cleared. The lines
+        left above the cleared lines are shifted back up first. Every cleared
+        line was among the saved rows, so restoring those puts them back too.
+        """
+        if cleared_rows:
+            kept = np.ones(Field.HEIGHT, dtype=bool)
+            kept[cleared_rows] = False
+            self.state[kept] = self.state[len(cleared_rows):].copy()
+        self.state[r_start:r_start + len(saved_rows)] = saved_rows
+
     def copy(self):
         """
         Returns a copy of the field.
         """
-        return Field(self.state.copy())
+        return Field(self.state.copy(), self.column_heights.copy(),
+                     self.column_gaps.copy(), self._totals_())
 
     def drop(self, tetromino, column):
         """
@@ -128,22 +277,147 @@ class Field(): # pylint: disable=missing-class-docstring
         if (row := self._get_tetromino_drop_row_(tetromino, column)) == -1:
             return -1
         self._place_tetromino_(tetromino, row, column)
+        self._update_columns_(tetromino, row, column)
         return self._line_clear_()
 
+    def place(self, tetromino, column):
+        """
+        Drops a tetromino in the specified column in the same way as drop(),
+        but also returns a record of the placement which undo() takes to
+        restore the field to how it was before, so that candidate placements
+        can be tried on a single field without copying it.
+
+        Returns the number of lines cleared and the undo record, or -1 and None
+        if this tetromino cannot be dropped in this column.
+        """
+        assert isinstance(tetromino, Tetromino)
+        if (row := self._get_tetromino_drop_row_(tetromino, column)) == -1:
+            return -1, None
+        columns = (self.column_heights.copy(), self.column_gaps.copy(),
+                   self._totals_())
+        r_end = row + tetromino.height()
+        saved_rows = self._save_rows_(row, r_end)
+        self._place_tetromino_(tetromino, row, column)
+        self._update_columns_(tetromino, row, column)
+        # Only the rows the tetromino was placed in can have been filled.
+        if cleared_rows := self._full_rows_(row, r_end):
+            self._line_clear_()
+        return len(cleared_rows), (row, saved_rows, cleared_rows, columns)
+
+    def undo(self, record):
+        """
+        Reverses the placement described by an undo record returned by
+        place(). Placements must be undone in the reverse order they were
+        placed in.
+        """
+        row, saved_rows, cleared_rows, columns = record
+        self._restore_rows_(row, saved_rows, cleared_rows)
+        self._init_columns_(*columns)
+
+    def placements(self, orientations, moves=False):
+        """
+        Computes the fields resulting from dropping each of the given
+        Orientations in every column it fits in, all at once. Returns a list of
+        the (orientation, column) pairs that can be dropped, along with a
+        (n_placements, HEIGHT, WIDTH) boolean np array holding the resulting
+        fields, with filled lines already cleared. If moves is True, the moves
+        of the placements, as returned by Field.placement_moves(), are
+        returned as well.
+        """
+        heights = np.array(self.column_heights)
+        drops = []
+        for orientation in orientations:
+            rows = Field.HEIGHT - 1 - (np.lib.stride_tricks.sliding_window_view(
+                heights, orientation.width) + orientation.bottoms).max(axis=1)
+            for column in np.flatnonzero(rows < orientation.height):
+                rows[column] = self._scan_drop_row_(
+                    orientation.tetromino, int(column))
+            columns = np.flatnonzero(rows >= 0)
+            drops.append((orientation, columns, rows[columns]))
+        placements = [(orientation, int(column))
+                      for orientation, columns, _ in drops
+                      for column in columns]
+        boards = np.repeat((self.state != 0)[np.newaxis],
+                           len(placements), axis=0)
+        placed_rows = np.empty((len(placements), 4), dtype=np.int64)
+        start = 0
+        for orientation, columns, rows in drops:
+            end = start + len(columns)
+            cell_rows, cell_cols = orientation.cells
+            placed_rows[start:end] = rows[:, np.newaxis] + cell_rows
+            boards[np.arange(start, end)[:, np.newaxis], placed_rows[start:end],
+                   columns[:, np.newaxis] + cell_cols] = True
+            start = end
+        if moves:
+            return placements, Field.clear_lines(boards)[0], \
+                Field.placement_moves(boards, placed_rows)
+        return placements, Field.clear_lines(boards)[0]
+
+    @staticmethod
+    def placement_moves(boards, cell_rows):
+        """
+        Given a (n, HEIGHT, WIDTH) boolean np array of fields in which a
+        tetromino was just placed, before their filled lines are cleared, and
+        a (n, 4) np array of the row of every space of each tetromino, returns
+        a dictionary of the moves which led to each field: the height of the
+        middle of the tetromino, and the number of lines cleared times the
+        number of spaces of the tetromino cleared, as (n,) np arrays.
+        """
+        filled_lines = boards.all(axis=2)
+        cleared = filled_lines[np.arange(len(boards))[:, np.newaxis],
+                               cell_rows]
+        return {
+            'landing_height': Field.HEIGHT - (
+                cell_rows.min(axis=1) + cell_rows.max(axis=1) + 1) / 2,
+            'eroded_cells': filled_lines.sum(axis=1) * cleared.sum(axis=1),
+        }
+
+    @staticmethod
+    def board_keys(boards):
+        """
+        Returns a compact bytes key for each field in a (n, HEIGHT, WIDTH)
+        boolean np array of fields, identifying which spaces are filled.
+        """
+        return [key.tobytes() for key in np.packbits(
+            boards.reshape(len(boards), -1), axis=1)]
+
+    def key(self):
+        """
+        Returns a compact bytes key identifying which spaces of the field are
+        filled, matching the keys returned by Field.board_keys().
+        """
+        return np.packbits(self.state != 0).tobytes()
+
+    @staticmethod
+    def clear_lines(boards):
+        """
+        Removes all filled lines from a (n, HEIGHT, WIDTH) boolean np array of
+        fields at once. Returns the resulting fields along with the number of
+        lines cleared in each of them.
+        """
+        filled_lines = boards.all(axis=2)
+        n_filled = filled_lines.sum(axis=1)
+        if n_filled.any():
+            # Move the filled lines of each field to the top, preserving the
+            # order of the other lines, and then empty them.
+            order = np.argsort(~filled_lines, axis=1, kind='stable')
+            boards = np.take_along_axis(boards, order[:, :, np.newaxis], axis=1)
+            boards[np.arange(Field.HEIGHT) < n_filled[:, np.newaxis]] = False
+        return boards, n_filled
+
     def count_gaps(self):
         """
-        Check each column one by one to make sure there are no gaps in the
-        column.
+        Returns the number of empty spaces below the highest filled space of
+        each column, summed over all columns.
+        """
+        return self.total_gaps
+
+    def bumpiness(self):
+        """
+        Returns the sum of the absolute height differences between each pair of
+        adjacent columns.
         """
-        # Find the row of the highest tetromino piece in each column.
-        top_indices = np.argmax(self.state.T != 0, axis=1)
-        # If a column is empty, then set the top index for it to the bottom so
-        # we don't count it.
-        top_indices[top_indices == 0] = Field.HEIGHT
-        # Count the number of gaps past the first filled space per column
-        gaps = [np.count_nonzero(col[top:] == 0) for col, top in zip(
-            self.state.T, top_indices)]
-        return sum(gaps)
+        return self.total_bumpiness
 
     def heights(self):
         """
@@ -152,6 +426,4 @@ class Field(): # pylint: disable=missing-class-docstring
         from the bottom of the field, regardless of whether the spaces in
         between are filled.
         """
-        top_indices = np.argmax(self.state.T != 0, axis=1)
-        top_indices[top_indices == 0] = Field.HEIGHT
-        return Field.HEIGHT - top_indices
+        return np.array(self.column_heights)
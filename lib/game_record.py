@@ -0,0 +1,276 @@
+"""
+The GameRecord class records a game of Tetris as a compact binary log, and the
+GameRecorder class appends such logs to a file.
+
+Every record holds the seed of the game, if it had one, the number of
+tetrominos it was limited to, if any, the type of every
+tetromino dealt, and one 16 bit word per move packing the type, rotation and
+column of the tetromino played along with the number of lines it cleared.
+Every keyframe_interval moves, the field is stored as a keyframe of row
+bitmasks, so that the field after any move can be rebuilt by replaying at most
+keyframe_interval - 1 moves from the preceding keyframe.
+
+A record is laid out as a fixed size header followed by its pieces, moves and
+keyframes as little endian arrays, so that a file of records can be scanned
+without decoding the moves, and the arrays of each record are read without
+copying them.
+"""
+
+import os
+import struct
+
+import numpy as np
+
+from lib.bit_field import BitField
+from lib.field import Field
+from lib.tetromino import ORIENTATIONS, Tetromino
+
+# The bit offsets of the tetromino type, rotation and column of a move. The
+# lowest bits hold the number of lines cleared.
+TYPE_SHIFT = 9
+ROTATION_SHIFT = 7
+COLUMN_SHIFT = 3
+LINES_MASK = (1 << COLUMN_SHIFT) - 1
+
+# The Orientation of each tetromino type index and rotation a move can encode.
+MOVE_ORIENTATIONS = {
+    (Tetromino.TYPES.index(tetromino_type), orientation.rotation): orientation
+    for tetromino_type, orientations in ORIENTATIONS.items()
+    for orientation in orientations}
+
+class GameRecord(): # pylint: disable=missing-class-docstring
+
+    MAGIC = b'TGR2'
+    # The magic bytes, whether the game has no seed, a seed or a negative
+    # seed, the absolute value of the seed, the number of tetrominos the game
+    # was limited to or 0, the number of pieces, the number of moves and the
+    # keyframe interval.
+    HEADER = struct.Struct('<4sBQIIIH')
+    NO_SEED, SEED, NEGATIVE_SEED = range(3)
+    DEFAULT_KEYFRAME_INTERVAL = 32
+
+    def __init__(self, seed, max_length, pieces, moves, keyframes,
+                 keyframe_interval):
+        """
+        Initializes a GameRecord of a game with the given seed, or None, limited
+        to max_length tetrominos, or unlimited if it is 0, from the type index
+        of every tetromino dealt, the encoded moves and the keyframes, each of
+        which is a list or np array. Invoke GameRecord.create() instead.
+        """
+        assert 0 < keyframe_interval < 1 << 16
+        self.seed = seed
+        self.max_length = max_length
+        self.pieces = pieces
+        self.moves = moves
+        self.keyframes = keyframes
+        self.keyframe_interval = keyframe_interval
+
+    @staticmethod
+    def create(seed=None, keyframe_interval=DEFAULT_KEYFRAME_INTERVAL,
+               max_length=0):
+        """
+        Factory method to create an empty GameRecord to record a game with the
+        given seed, whose absolute value must fit in 64 bits, into. A game
+        limited to max_length tetrominos is scored the way training scores
+        it.
+        """
+        if seed is not None and abs(seed) >= 1 << 64:
+            raise ValueError('The absolute value of the seed of a recorded '
+                             'game must fit in 64 bits, got {}'.format(seed))
+        return GameRecord(seed, max_length, [], [], [], keyframe_interval)
+
+    def deal(self, tetromino_type):
+        """
+        Records that a tetromino of the given type was dealt.
+        """
+        self.pieces.append(Tetromino.TYPES.index(tetromino_type))
+
+    def move(self, tetromino_type, rotation, column, lines_cleared, field):
+        """
+        Records a tetromino of the given type and rotation played in the given
+        column, clearing the given number of lines and resulting in the given
+        field, either a Field or a (HEIGHT, WIDTH) np array of its state, which
+        is only read when a keyframe is due.
+        """
+        self.moves.append(Tetromino.TYPES.index(tetromino_type) << TYPE_SHIFT |
+                          rotation << ROTATION_SHIFT |
+                          column << COLUMN_SHIFT | lines_cleared)
+        if len(self.moves) % self.keyframe_interval == 0:
+            self.keyframes.append(GameRecord._row_masks_(field))
+
+    @staticmethod
+    def _row_masks_(field):
+        """
+        Returns the list of the row bitmasks of the given Field or np array of
+        a field state.
+        """
+        if isinstance(field, BitField):
+            return list(field.rows)
+        if isinstance(field, Field):
+            field = field.state
+        return ((np.asarray(field) != 0) @ BitField.COLUMN_BITS).tolist()
+
+    def to_bytes(self):
+        """
+        Returns the binary log of this GameRecord.
+        """
+        if self.seed is None:
+            seed_kind = GameRecord.NO_SEED
+        else:
+            seed_kind = GameRecord.NEGATIVE_SEED if self.seed < 0 else \
+                GameRecord.SEED
+        return GameRecord.HEADER.pack(
+            GameRecord.MAGIC, seed_kind,
+            0 if self.seed is None else abs(self.seed), self.max_length,
+            len(self.pieces),
+            len(self.moves), self.keyframe_interval) + \
+            np.asarray(self.pieces, dtype=np.uint8).tobytes() + \
+            np.asarray(self.moves, dtype='<u2').tobytes() + \
+            np.asarray(self.keyframes, dtype='<u2').tobytes()
+
+    @staticmethod
+    def from_bytes(buffer, offset=0):
+        """
+        Reads the GameRecord at the given offset of a bytes-like object,
+        returning it along with the offset just past it. The arrays of the
+        record are views of the buffer.
+        """
+        magic, seed_kind, seed, max_length, n_pieces, n_moves, \
+            keyframe_interval = GameRecord.HEADER.unpack_from(buffer, offset)
+        if magic != GameRecord.MAGIC:
+            raise ValueError('No GameRecord at offset {}'.format(offset))
+        offset += GameRecord.HEADER.size
+        pieces = np.frombuffer(buffer, np.uint8, n_pieces, offset)
+        offset += n_pieces
+        moves = np.frombuffer(buffer, '<u2', n_moves, offset)
+        offset += 2 * n_moves
+        n_keyframes = n_moves // keyframe_interval
+        keyframes = np.frombuffer(
+            buffer, '<u2', n_keyframes * Field.HEIGHT, offset).reshape(
+                n_keyframes, Field.HEIGHT)
+        offset += 2 * keyframes.size
+        if seed_kind == GameRecord.NO_SEED:
+            seed = None
+        elif seed_kind == GameRecord.NEGATIVE_SEED:
+            seed = -seed
+        return GameRecord(seed, max_length, pieces, moves, keyframes,
+                          keyframe_interval), offset
+
+    @staticmethod
+    def read_all(path):
+        """
+        Generates every GameRecord in the file at the given path, in order.
+        """
+        with open(path, 'rb') as file:
+            buffer = file.read()
+        offset = 0
+        while offset < len(buffer):
+            record, offset = GameRecord.from_bytes(buffer, offset)
+            yield record
+
+    def __len__(self):
+        """
+        Returns the number of moves recorded.
+        """
+        return len(self.moves)
+
+    def tetromino_types(self):
+        """
+        Returns the types of the tetrominos dealt, in order.
+        """
+        return [Tetromino.TYPES[piece] for piece in self.pieces]
+
+    def lines_cleared(self):
+        """
+        Returns a np array of the number of lines cleared by each move.
+        """
+        return np.asarray(self.moves) & LINES_MASK
+
+    def score(self):
+        """
+        Returns the score of the game the way TetrisChromosome.simulate()
+        scores it, the number of tetrominos placed plus the number of lines
+        cleared, where a game which reached its max_length counts one
+        tetromino fewer.
+        """
+        n_placed = len(self.moves) if not self.max_length else \
+            min(len(self.moves), self.max_length - 1)
+        return n_placed + int(self.lines_cleared().sum())
+
+    def placement(self, index):
+        """
+        Returns the Orientation and column of the move at the given index.
+        """
+        move = int(self.moves[index])
+        orientation = MOVE_ORIENTATIONS[
+            move >> TYPE_SHIFT, move >> ROTATION_SHIFT & 3]
+        return orientation, move >> COLUMN_SHIFT & 0xf
+
+    def field_at(self, n_moves):
+        """
+        Rebuilds the field after the given number of moves as a BitField, by
+        replaying the moves since the last keyframe before it.
+        """
+        assert 0 <= n_moves <= len(self.moves)
+        n_keyframe = min(n_moves // self.keyframe_interval,
+                         len(self.keyframes))
+        field = BitField([0] * Field.HEIGHT) if n_keyframe == 0 else \
+            BitField([int(row) for row in self.keyframes[n_keyframe - 1]])
+        for index in range(n_keyframe * self.keyframe_interval, n_moves):
+            orientation, column = self.placement(index)
+            field.drop(orientation.tetromino, column)
+        return field
+
+class GameRecorder(): # pylint: disable=missing-class-docstring
+
+    def __init__(self, path, keyframe_interval):
+        """
+        Initializes a GameRecorder appending GameRecords to the file at the
+        given path. Invoke GameRecorder.create() instead.
+        """
+        self.path = path
+        self.keyframe_interval = keyframe_interval
+        self.fd = None
+        self.pid = None
+
+    @staticmethod
+    def create(path, keyframe_interval=GameRecord.DEFAULT_KEYFRAME_INTERVAL):
+        """
+        Factory method to create a GameRecorder appending to the file at the
+        given path, recording keyframes every keyframe_interval moves.
+        """
+        return GameRecorder(path, keyframe_interval)
+
+    def start(self, seed=None, max_length=0):
+        """
+        Returns an empty GameRecord to record a game with the given seed,
+        limited to max_length tetrominos if it is not 0, into.
+        """
+        return GameRecord.create(seed, self.keyframe_interval, max_length)
+
+    def write(self, records):
+        """
+        Appends the given GameRecords to the file. The file is opened once per
+        process, and all of the records are written with a single append, so
+        that processes recording into the same file do not interleave them.
+        """
+        if self.pid != os.getpid():
+            self.fd = os.open(self.path,
+                              os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            self.pid = os.getpid()
+        os.write(self.fd, b''.join(record.to_bytes() for record in records))
+
+    def close(self):
+        """
+        Closes the file, if this process opened it.
+        """
+        if self.pid == os.getpid():
+            os.close(self.fd)
+        self.fd = self.pid = None
+
+    def __getstate__(self):
+        """
+        The file descriptor is not pickled, so other processes open their own.
+        """
+        return {'path': self.path, 'keyframe_interval': self.keyframe_interval,
+                'fd': None, 'pid': None}
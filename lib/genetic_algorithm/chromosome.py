@@ -7,13 +7,20 @@ import numpy as np
 
 class Chromosome(): # pylint: disable=missing-class-docstring
 
+    # The number of moves played by the simulations of this class in the
+    # current process, for subclasses whose simulations are games.
+    n_moves = 0
+
     def __init__(self, genes, fitness=1):
         """
         Initializes a Chromosome. Every chromosome has a default fitness of 1.
-        The higher the fitness, the better the Chromosome.
+        The higher the fitness, the better the Chromosome. The results of the
+        simulations its fitness was computed from, if any, are kept in
+        results.
         """
         self.genes = genes
         self.fitness = fitness
+        self.results = []
 
     def __str__(self):
         """
@@ -25,7 +32,23 @@ class Chromosome(): # pylint: disable=missing-class-docstring
     def _cross_(c1, c2, mutation_chance): # pylint: disable=invalid-name
         """
         Performs genetic crossing between two given chromosomes, returning the
-        new chromosome's gene sequence.
+        new chromosome's gene sequence, in the same way as cross_all(). Either
+        chromosome is evaluated first if it has not been evaluated yet.
+        """
+        assert isinstance(c1, Chromosome) and isinstance(c2, Chromosome)
+        assert len(c1.genes) == len(c2.genes)
+        return Chromosome.cross_all(
+            np.asarray(c1.genes)[np.newaxis], np.asarray(c2.genes)[np.newaxis],
+            np.array([c1.get_fitness()]), np.array([c2.get_fitness()]),
+            mutation_chance)[0]
+
+    @staticmethod
+    def cross_all(genes1, genes2, fitness1, fitness2, mutation_chance):
+        """
+        Performs genetic crossing between every pair of rows of two
+        (n, n_genes) np arrays of gene sequences with the given (n,) np
+        arrays of fitness, returning the (n, n_genes) np array of the new gene
+        sequences.
 
         The genetic values stored in a chromosome are all numeric in the open
         interval from -1 to 1. When we cross two chromosomes, we will take the
@@ -36,28 +59,80 @@ class Chromosome(): # pylint: disable=missing-class-docstring
         genetic value. If one occurs, that genetic value will be set to a new
         random number in the open interval from -1 to 1.
         """
-        assert isinstance(c1, Chromosome) and isinstance(c2, Chromosome)
-        assert len(c1.genes) == len(c2.genes)
-        w_sum = c1.fitness + c2.fitness
-        n_genes = len(c1.genes)
-        new_genes = (c1.genes * c1.fitness / w_sum) + (
-            c2.genes * c2.fitness / w_sum)
+        w_sum = fitness1 + fitness2
+        new_genes = genes1 * (fitness1 / w_sum)[:, np.newaxis] + \
+            genes2 * (fitness2 / w_sum)[:, np.newaxis]
         # Each gene value has a chance to mutate by becoming a random number.
-        mutated_genes = np.random.random_sample(n_genes) < mutation_chance
+        mutated_genes = np.random.random_sample(new_genes.shape) < \
+            mutation_chance
         if np.any(mutated_genes):
-            mutation = (np.random.random_sample(n_genes) * 2) - 1
+            mutation = (np.random.random_sample(new_genes.shape) * 2) - 1
             # Compose the original genetic values with the mutated genetic
             # values.
-            new_genes = (new_genes * np.logical_not(mutated_genes)) + (
-                mutation * mutated_genes)
+            new_genes = np.where(mutated_genes, mutation, new_genes)
         return new_genes
 
     def cross(self, other, mutation_chance):
-        # pylint: disable=missing-function-docstring
+        """
+        Performs genetic crossing between this chromosome and another one,
+        returning the resulting child.
+        """
+        return self.child(Chromosome._cross_(self, other, mutation_chance))
+
+    def child(self, genes):
+        """
+        Returns a new chromosome with the given genes and the same settings as
+        this one, whose fitness has not been evaluated.
+        """
+        raise NotImplementedError('Method not implemented!')
+
+    def simulate(self, seed=None, n_simulations=None):
+        """
+        Runs the simulations that evaluate this chromosome with an optional
+        seed, returning their results without updating the fitness. If
+        n_simulations is given, that many simulations are run instead of the
+        usual number.
+        """
         raise NotImplementedError('Method not implemented!')
 
-    def recalculate_fitness(self): # pylint: disable=missing-function-docstring
+    @staticmethod
+    def simulate_all(chromosomes, seeds, n_simulations=None):
+        """
+        Runs the simulations of each of the given chromosomes with the
+        corresponding seed, returning a list of their results. Subclasses can
+        override this to simulate many chromosomes together.
+        """
+        return [chromosome.simulate(seed, n_simulations)
+                for chromosome, seed in zip(chromosomes, seeds)]
+
+    def record_results(self, results, accumulate=False):
+        """
+        Updates the fitness of this chromosome from the results of simulate().
+        If accumulate is True, the results are combined with the results
+        recorded previously instead of replacing them.
+        """
         raise NotImplementedError('Method not implemented!')
 
-    def get_fitness(self): # pylint: disable=missing-function-docstring
+    def recalculate_fitness(self, seed=None):
+        """
+        Evaluates the fitness of this chromosome from scratch.
+        """
+        self.record_results(self.simulate(seed))
+        return self.fitness
+
+    def accumulate_fitness(self, seed=None):
+        """
+        Runs more simulations and folds their results into the fitness of this
+        chromosome.
+        """
+        self.record_results(self.simulate(seed), accumulate=True)
+        return self.fitness
+
+    def get_fitness(self):
+        """
+        Returns the fitness of this chromosome, evaluating it first if it has
+        not been evaluated yet.
+        """
+        if self.fitness is None:
+            self.recalculate_fitness()
         return self.fitness
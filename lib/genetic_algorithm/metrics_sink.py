@@ -0,0 +1,39 @@
+"""
+The MetricsSink class records the metrics of each generation of a Population as
+a stream of JSON Lines, one JSON object per line, so that training runs can be
+charted and compared after the fact.
+"""
+
+import json
+
+class MetricsSink(): # pylint: disable=missing-class-docstring
+
+    def __init__(self, file):
+        """
+        Initializes a MetricsSink writing to the given text file object.
+        Invoke MetricsSink.create() instead.
+        """
+        self.file = file
+
+    @staticmethod
+    def create(path):
+        """
+        Factory method to create a MetricsSink appending to the file at the
+        given path, so that a resumed run continues the same stream.
+        """
+        # pylint: disable=consider-using-with
+        return MetricsSink(open(path, 'a', encoding='utf-8'))
+
+    def write(self, record):
+        """
+        Writes a dictionary of metrics as a line of JSON, flushing it so that
+        the stream can be followed while training runs.
+        """
+        self.file.write(json.dumps(record) + '\n')
+        self.file.flush()
+
+    def close(self):
+        """
+        Closes the underlying file.
+        """
+        self.file.close()
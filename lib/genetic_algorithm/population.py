@@ -3,55 +3,523 @@ File containing the Population class, which contains a group of Chromosomes
 for training in the genetic algorithm.
 """
 
+import asyncio
+import concurrent.futures
+import contextlib
+import multiprocessing
+import os
 import random
+import time
 
+import numpy as np
+
+from lib import profiler
 from lib.genetic_algorithm.chromosome import Chromosome
 
+def _cache_counts_(chromosome_class):
+    """
+    Returns the hits and misses of the evaluation cache of the given
+    chromosome class so far, or zeros if it has none.
+    """
+    cache = getattr(chromosome_class, 'evaluation_cache', None)
+    return np.array([0, 0] if cache is None else [cache.hits, cache.misses])
+
+def _simulate_all_(chromosomes, seeds, n_simulations=None):
+    """
+    Runs the simulations of the given chromosomes with the given seeds,
+    returning their results, the number of moves played, the hits and misses
+    of the evaluation cache and the profiler statistics gathered while
+    playing them. This is invoked in worker processes, whose evaluation
+    caches the parent process cannot see, so only the simulation results and
+    these counters are sent back.
+    """
+    chromosome_class = type(chromosomes[0])
+    n_moves = chromosome_class.n_moves
+    cache_counts = _cache_counts_(chromosome_class)
+    results = chromosome_class.simulate_all(chromosomes, seeds, n_simulations)
+    return results, chromosome_class.n_moves - n_moves, \
+        _cache_counts_(chromosome_class) - cache_counts, profiler.collect()
+
 class Population(): # pylint: disable=missing-class-docstring
 
     DEFAULT_MUTATION_CHANCE = 0.075
 
-    def __init__(self, population, mutation_chance=DEFAULT_MUTATION_CHANCE):
+    # Policies for evaluating the chromosomes which survive a generation.
+    # Chromosomes which have never been evaluated are always evaluated.
+    RECALCULATE = 'recalculate'
+    CACHE = 'cache'
+    ACCUMULATE = 'accumulate'
+    FITNESS_POLICIES = [RECALCULATE, CACHE, ACCUMULATE]
+
+    # When racing, a chromosome keeps playing while its fitness is within this
+    # many standard errors of the fitness at the selection cut. A chromosome
+    # which has played once is assumed to have a standard deviation of this
+    # fraction of its fitness, as game lengths are roughly exponential.
+    RACING_CONFIDENCE = 2
+    RACING_PRIOR_DEVIATION = 1
+
+    def __init__(self, population, mutation_chance=DEFAULT_MUTATION_CHANCE,
+                 workers=1, fitness_policy=RECALCULATE,
+                 common_random_numbers=False, racing=False, metrics=None,
+                 verbose=True, work_queue=None, steady_state=False):
         """
-        Initializes a Population of chromosomes.
+        Initializes a Population of chromosomes. If more than one worker is
+        specified, the fitness of the chromosomes is evaluated in a pool of
+        that many processes. If a WorkQueue is given, the fitness is evaluated
+        by the workers connected to it instead, split into that many tasks.
+
+        The fitness policy determines what happens to the fitness of the
+        chromosomes that survive each generation: RECALCULATE evaluates them
+        from scratch, CACHE keeps their existing fitness, and ACCUMULATE runs
+        more simulations and combines them with their previous results.
+
+        With common random numbers, every chromosome evaluated together is
+        evaluated with the same seed, so that chromosomes are compared on
+        identical games, which lowers the variance of their ranking.
+
+        With racing, chromosomes are evaluated one simulation at a time, and
+        only those whose side of the selection cut is still uncertain keep
+        playing, up to their usual number of simulations. This relies on the
+        chromosomes having an n_simulations attribute.
+
+        In steady-state mode, instead of breeding whole generations, a child is
+        bred as soon as one of the workers is free, and replaces the least fit
+        chromosome as soon as it is evaluated, so long games do not hold up
+        the other workers. A generation is then as many children as half the
+        population. Survivors keep their fitness whatever the fitness policy,
+        and racing and common random numbers are not supported.
+
+        If a MetricsSink is given, the metrics of every generation are written
+        to it. If verbose is True, every member of every generation is printed.
         """
         assert len(population) % 4 == 0
+        assert workers >= 1
+        assert fitness_policy in Population.FITNESS_POLICIES
+        assert not steady_state or not (racing or common_random_numbers)
         for chromosome in population:
             assert isinstance(chromosome, Chromosome)
         self.population = population
         self.mutation_chance = mutation_chance
+        self.workers = workers
+        self.fitness_policy = fitness_policy
+        self.common_random_numbers = common_random_numbers
+        self.racing = racing
+        self.metrics = metrics
+        self.verbose = verbose
+        self.work_queue = work_queue
+        self.steady_state = steady_state
         self.generations = 0
+        # The hits and misses of the evaluation caches of every process which
+        # has evaluated this population.
+        self.cache_counts = np.zeros(2, dtype=np.int64)
+        self._reset_counters_()
+
+    def _reset_counters_(self):
+        """
+        Resets the counters of the work done since the metrics of the last
+        generation were recorded.
+        """
+        self.evaluation_time = 0
+        self.breeding_time = 0
+        self.n_simulations = 0
+        self.n_moves = 0
+        self.profile = {}
+
+    def _simulate_(self, chromosomes, pool, n_simulations=None):
+        """
+        Runs the simulations of the given chromosomes, in the given process
+        pool or WorkQueue if it is not None, returning their results. Seeds
+        are drawn from the random module, so the results are the same whether
+        or not a process pool is used.
+        """
+        start_time = time.perf_counter()
+        if self.common_random_numbers:
+            seeds = [random.getrandbits(32)] * len(chromosomes)
+        else:
+            seeds = [random.getrandbits(32) for _ in chromosomes]
+        if pool is None:
+            results, n_moves, cache_counts, profile = _simulate_all_(
+                chromosomes, seeds, n_simulations)
+        else:
+            # Split the chromosomes evenly so that each worker simulates its
+            # share of them together.
+            bounds = [len(chromosomes) * i // self.workers
+                      for i in range(self.workers + 1)]
+            shares = pool.starmap(_simulate_all_, [
+                (chromosomes[start:end], seeds[start:end], n_simulations)
+                for start, end in zip(bounds, bounds[1:]) if start < end])
+            results = sum((share for share, _, _, _ in shares), [])
+            n_moves = sum(share_moves for _, share_moves, _, _ in shares)
+            cache_counts = sum(share_counts for _, _, share_counts, _ in shares)
+            profile = profiler.merge(*(
+                share_profile for _, _, _, share_profile in shares))
+        self.evaluation_time += time.perf_counter() - start_time
+        self.n_simulations += sum(len(result) for result in results)
+        self.n_moves += n_moves
+        self.cache_counts += cache_counts
+        self.profile = profiler.merge(self.profile, profile)
+        return results
+
+    def _evaluate_(self, chromosomes, pool, accumulate=False):
+        """
+        Evaluates the fitness of the given chromosomes, in the given process
+        pool if it is not None.
+        """
+        if not chromosomes:
+            return
+        if self.racing:
+            self._race_(chromosomes, pool, accumulate)
+            return
+        results = self._simulate_(chromosomes, pool)
+        for chromosome, result in zip(chromosomes, results):
+            chromosome.record_results(
+                result, accumulate and chromosome.fitness is not None)
+
+    def _race_(self, chromosomes, pool, accumulate):
+        """
+        Evaluates the fitness of the given chromosomes by racing them against
+        the selection cut. Every chromosome plays one simulation, and then the
+        chromosomes whose fitness is too close to the cut to tell which side of
+        it they are on play one more, until each of them is either clear of the
+        cut or has played its usual number of simulations.
+        """
+        for chromosome, result in zip(chromosomes, self._simulate_(
+                chromosomes, pool, 1)):
+            chromosome.record_results(
+                result, accumulate and chromosome.fitness is not None)
+        n_played = 1
+        racing = chromosomes
+        while True:
+            # The cut only moves once results are recorded, so it is found
+            # once per round.
+            cut_fitness = self._cut_fitness_()
+            if not (racing := [chromosome for chromosome in racing
+                               if n_played < chromosome.n_simulations and
+                               self._is_uncertain_(chromosome, cut_fitness)]):
+                break
+            for chromosome, result in zip(racing, self._simulate_(
+                    racing, pool, 1)):
+                chromosome.record_results(result, accumulate=True)
+            n_played += 1
+
+    def _cut_fitness_(self):
+        """
+        Returns the fitness halfway between the least fit chromosome which
+        would survive selection and the fittest one which would not.
+        """
+        fitness = sorted(chromosome.fitness for chromosome in self.population
+                         if chromosome.fitness is not None)
+        cut = len(fitness) - len(self.population) // 2
+        return (fitness[max(cut - 1, 0)] + fitness[cut]) / 2
+
+    @staticmethod
+    def _is_uncertain_(chromosome, cut_fitness):
+        """
+        Returns whether the given chromosome's fitness is within
+        RACING_CONFIDENCE standard errors of the given fitness, estimating the
+        standard deviation of its results from them once it has more than one.
+        """
+        results = chromosome.results
+        deviation = np.std(results, ddof=1) if len(results) > 1 else \
+            Population.RACING_PRIOR_DEVIATION * abs(chromosome.fitness)
+        return abs(chromosome.fitness - cut_fitness) <= \
+            Population.RACING_CONFIDENCE * deviation / np.sqrt(len(results))
+
+    def _evaluate_generation_(self, pool):
+        """
+        Evaluates the fitness of the population after breeding according to
+        the fitness policy.
+        """
+        if self.fitness_policy == Population.CACHE:
+            self._evaluate_([chromosome for chromosome in self.population
+                             if chromosome.fitness is None], pool)
+        else:
+            self._evaluate_(self.population, pool, accumulate=(
+                self.fitness_policy == Population.ACCUMULATE))
+
+    def save_checkpoint(self, path):
+        """
+        Saves the genes, fitness and results of every chromosome, the
+        generation counter and the state of the random and np.random modules to
+        a compressed npz file at the given path. The file is written to a
+        temporary path first and then moved into place, so an interrupted save
+        never corrupts an existing checkpoint.
+        """
+        _, internal_state, gauss_next = random.getstate()
+        np_name, np_keys, np_position, np_has_gauss, np_gauss = \
+            np.random.get_state()
+        assert np_name == 'MT19937'
+        temporary_path = path + '.tmp'
+        with open(temporary_path, 'wb') as checkpoint:
+            np.savez_compressed(
+                checkpoint,
+                genes=np.array([chromosome.genes
+                                for chromosome in self.population]),
+                fitness=np.array([
+                    np.nan if chromosome.fitness is None else chromosome.fitness
+                    for chromosome in self.population], dtype=np.float64),
+                results=np.array([
+                    result for chromosome in self.population
+                    for result in chromosome.results], dtype=np.float64),
+                n_results=np.array([len(chromosome.results)
+                                    for chromosome in self.population]),
+                generations=self.generations,
+                random_state=np.array(internal_state, dtype=np.uint32),
+                random_gauss=np.nan if gauss_next is None else gauss_next,
+                np_random_state=np_keys,
+                np_random_gauss=np.array(
+                    [np_position, np_has_gauss, np_gauss], dtype=np.float64))
+        os.replace(temporary_path, path)
 
-    def run(self, generations):
+    def load_checkpoint(self, path):
+        """
+        Restores a checkpoint written by save_checkpoint() into this
+        population, which must have the same size and number of genes per
+        chromosome as the checkpointed one, or a ValueError is raised. The
+        genes, fitness and results of every chromosome are replaced, and the
+        random and np.random modules continue from where they left off.
+        """
+        with np.load(path) as checkpoint:
+            genes = checkpoint['genes']
+            if len(genes) != len(self.population):
+                raise ValueError(
+                    'The checkpoint has a population of {} chromosomes, but '
+                    'this population has {}'.format(len(genes),
+                                                    len(self.population)))
+            n_genes = len(self.population[0].genes)
+            if genes.shape[1] != n_genes:
+                raise ValueError(
+                    'The checkpoint has chromosomes of {} genes, but this '
+                    'population has chromosomes of {}'.format(genes.shape[1],
+                                                              n_genes))
+            results = np.split(checkpoint['results'],
+                               np.cumsum(checkpoint['n_results'])[:-1])
+            for chromosome, chromosome_genes, fitness, chromosome_results in \
+                    zip(self.population, genes, checkpoint['fitness'], results):
+                chromosome.genes = chromosome_genes
+                chromosome.fitness = None if np.isnan(fitness) else fitness
+                chromosome.results = chromosome_results.tolist()
+            self.generations = int(checkpoint['generations'])
+            gauss_next = float(checkpoint['random_gauss'])
+            random.setstate((3, tuple(checkpoint['random_state'].tolist()),
+                             None if np.isnan(gauss_next) else gauss_next))
+            np_position, np_has_gauss, np_gauss = checkpoint['np_random_gauss']
+            np.random.set_state(('MT19937', checkpoint['np_random_state'],
+                                 int(np_position), int(np_has_gauss),
+                                 float(np_gauss)))
+
+    def run(self, generations, checkpoint=None, checkpoint_interval=1):
         """
         This method will run the genetic algorithm on the population for the
-        given number of generations.
-        """
-        cut = len(self.population) // 2
-        for _ in range(generations):
-            # Sort the population of chromosomes by their fitness
-            population_by_fitness = sorted(
-                self.population, key=lambda gene: gene.get_fitness())
-            print('Generation: {}'.format(self.generations))
-            for member in population_by_fitness:
-                print(member)
-            # Select the top half of the fittest members.
-            fittest = population_by_fitness[cut:]
-            # Shuffle and cross breed the fittest members.
-            random.shuffle(fittest)
-            for i in range(0, cut, 2):
-                # Add two children so the population size remains the same.
-                fittest += [fittest[i].cross(
-                    fittest[i + 1], self.mutation_chance)]
-                fittest += [fittest[i].cross(
-                    fittest[i + 1], self.mutation_chance)]
-            self.population = fittest
-            for chromosome in self.population:
-                chromosome.recalculate_fitness()
-            self.generations += 1
+        given number of generations. If a checkpoint path is given, a
+        checkpoint is saved to it every checkpoint_interval generations and
+        once the run is over.
+        """
+        if self.steady_state:
+            if self.work_queue is not None:
+                executor = contextlib.nullcontext(self.work_queue)
+            elif self.workers > 1:
+                executor = concurrent.futures.ProcessPoolExecutor(self.workers)
+            else:
+                executor = concurrent.futures.ThreadPoolExecutor(1)
+            with executor as executor:
+                asyncio.run(self._run_steady_state_(
+                    generations, executor, checkpoint, checkpoint_interval))
+        elif self.work_queue is not None:
+            self._run_(generations, self.work_queue, checkpoint,
+                       checkpoint_interval)
+        elif self.workers > 1:
+            with multiprocessing.Pool(self.workers) as pool:
+                self._run_(generations, pool, checkpoint, checkpoint_interval)
+        else:
+            self._run_(generations, None, checkpoint, checkpoint_interval)
+
+    def _run_(self, generations, pool, checkpoint, checkpoint_interval):
+        """
+        Runs the genetic algorithm for the given number of generations,
+        recalculating fitness in the given process pool if it is not None and
+        saving checkpoints to the given path if it is not None.
+        """
+        self._evaluate_([chromosome for chromosome in self.population
+                         if chromosome.fitness is None], pool)
+        for generation in range(generations):
+            fitness = self._fitness_()
+            if self.verbose:
+                self._print_generation_(fitness)
+            start_time = time.perf_counter()
+            self._breed_(fitness)
+            self.breeding_time += time.perf_counter() - start_time
+            self._evaluate_generation_(pool)
+            self._end_generation_(generation == generations - 1, checkpoint,
+                                  checkpoint_interval)
+        if checkpoint is not None:
+            self.save_checkpoint(checkpoint)
+
+    async def _run_steady_state_(self, generations, executor, checkpoint,
+                                 checkpoint_interval):
+        """
+        Runs the genetic algorithm in steady-state mode for the given number
+        of generations, evaluating up to as many children at once as there are
+        workers in the given concurrent.futures.Executor and saving
+        checkpoints to the given path if it is not None. Children which are
+        still being evaluated when a checkpoint is saved are not part of it.
+        """
+        generation_start = time.perf_counter()
+        await asyncio.gather(*(
+            self._evaluate_async_(chromosome, executor)
+            for chromosome in self.population if chromosome.fitness is None))
+        generation_size = len(self.population) // 2
+        n_children = generations * generation_size
+        n_bred = n_evaluated = 0
+        evaluating = set()
+        while n_evaluated < n_children:
+            while len(evaluating) < self.workers and n_bred < n_children:
+                start_time = time.perf_counter()
+                child = self._breed_child_()
+                self.breeding_time += time.perf_counter() - start_time
+                evaluating.add(asyncio.ensure_future(
+                    self._evaluate_async_(child, executor)))
+                n_bred += 1
+            done, evaluating = await asyncio.wait(
+                evaluating, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                start_time = time.perf_counter()
+                self._replace_worst_(task.result())
+                self.breeding_time += time.perf_counter() - start_time
+                n_evaluated += 1
+                if n_evaluated % generation_size == 0:
+                    self.evaluation_time = time.perf_counter() - \
+                        generation_start - self.breeding_time
+                    if self.verbose:
+                        self._print_generation_(self._fitness_())
+                    self._end_generation_(n_evaluated == n_children,
+                                          checkpoint, checkpoint_interval)
+                    generation_start = time.perf_counter()
+        if checkpoint is not None:
+            self.save_checkpoint(checkpoint)
+
+    async def _evaluate_async_(self, chromosome, executor):
+        """
+        Evaluates the fitness of the given chromosome in the given
+        concurrent.futures.Executor without blocking the event loop, returning
+        the chromosome once it is done. Its seed is drawn from the random
+        module as soon as this is called.
+        """
+        seed = random.getrandbits(32)
+        results, n_moves, cache_counts, profile = \
+            await asyncio.get_running_loop().run_in_executor(
+                executor, _simulate_all_, [chromosome], [seed])
+        chromosome.record_results(results[0])
+        self.n_simulations += len(results[0])
+        self.n_moves += n_moves
+        self.cache_counts += cache_counts
+        self.profile = profiler.merge(self.profile, profile)
+        return chromosome
+
+    def _breed_child_(self):
+        """
+        Returns the child of two different chromosomes picked at random from
+        the fittest half of the population.
+        """
+        fitness = self._fitness_()
+        cut = len(fitness) // 2
+        parent1, parent2 = np.random.choice(
+            np.argpartition(fitness, cut)[cut:], 2, replace=False)
+        return self.population[parent1].cross(self.population[parent2],
+                                              self.mutation_chance)
+
+    def _replace_worst_(self, child):
+        """
+        Replaces the least fit chromosome of the population with the given
+        evaluated child.
+        """
+        self.population[int(np.argmin(self._fitness_()))] = child
+
+    def _print_generation_(self, fitness):
+        """
+        Prints every member of the current generation, from the least to the
+        most fit, given their fitness.
+        """
+        print('Generation: {}'.format(self.generations))
+        for index in np.argsort(fitness, kind='stable'):
+            print(self.population[index])
+
+    def _end_generation_(self, last, checkpoint, checkpoint_interval):
+        """
+        Counts a generation as done, writing its metrics and profile, and saves
+        a checkpoint to the given path if it is not None and it is due, unless
+        this is the last generation of the run, which is checkpointed at the
+        end of the run.
+        """
+        self.generations += 1
+        if self.metrics is not None:
+            self.metrics.write(self._generation_metrics_())
+        if self.profile:
+            print(profiler.summary(self.profile))
+        self._reset_counters_()
+        if checkpoint is not None and not last and (
+                self.generations % checkpoint_interval == 0):
+            self.save_checkpoint(checkpoint)
+
+    def _fitness_(self):
+        """
+        Returns the (pop_size,) np array of the fitness of every chromosome,
+        evaluating those which have not been evaluated yet.
+        """
+        return np.array([chromosome.get_fitness()
+                         for chromosome in self.population], dtype=np.float64)
+
+    def _breed_(self, fitness):
+        """
+        Replaces the least fit half of the population with the children of the
+        fittest half, given the fitness of every chromosome. Selection,
+        pairing and crossing are done on the (pop_size, n_genes) np array of
+        the genes of the population as a whole: the fittest half is shuffled
+        into pairs, and each pair has two children so that the population size
+        remains the same.
+        """
+        genes = np.array([chromosome.genes for chromosome in self.population],
+                         dtype=np.float64)
+        fittest = np.random.permutation(
+            np.argsort(fitness, kind='stable')[len(self.population) // 2:])
+        parents1 = np.repeat(fittest[0::2], 2)
+        parents2 = np.repeat(fittest[1::2], 2)
+        children = type(self.population[0]).cross_all(
+            genes[parents1], genes[parents2], fitness[parents1],
+            fitness[parents2], self.mutation_chance)
+        self.population = [self.population[index] for index in fittest] + [
+            self.population[parent].child(child_genes)
+            for parent, child_genes in zip(parents1, children)]
+
+    def _generation_metrics_(self):
+        """
+        Returns a dictionary of the metrics of the generation which was just
+        evaluated. Times are in seconds, and the evaluation time includes
+        evaluating the initial population in the first generation of a run.
+        """
+        fitness = self._fitness_()
+        order = np.argsort(-fitness, kind='stable')
+        fitness = fitness[order]
+        return {
+            'generation': self.generations,
+            'best_fitness': float(fitness.max()),
+            'median_fitness': float(np.median(fitness)),
+            'mean_fitness': float(fitness.mean()),
+            'fitness': fitness.tolist(),
+            'genes': [np.asarray(self.population[index].genes).tolist()
+                      for index in order],
+            'evaluation_time': self.evaluation_time,
+            'breeding_time': self.breeding_time,
+            'simulations': self.n_simulations,
+            'moves': self.n_moves,
+            'moves_per_sec': self.n_moves / self.evaluation_time
+                             if self.evaluation_time else 0.0,
+            'profile': {name: {'calls': calls, 'time': seconds}
+                        for name, (calls, seconds) in self.profile.items()},
+        }
 
     def get_fittest_member(self):
         """
         Returns the fittest member present in the population.
         """
-        return sorted(self.population, key=lambda gene: gene.get_fitness())[-1]
+        return self.population[np.argsort(self._fitness_(), kind='stable')[-1]]
@@ -44,5 +44,20 @@ class TestChromosome(unittest.TestCase):
         np.testing.assert_almost_equal(result, [0.08976, 3, 0.29178],
                                        decimal=5)
 
+    def test_cross_all(self): # pylint: disable=no-self-use
+        np.random.seed(0)
+        genes1 = np.random.random_sample((6, 4))
+        genes2 = np.random.random_sample((6, 4))
+        fitness1 = np.random.random_sample(6)
+        fitness2 = np.random.random_sample(6)
+        result = Chromosome.cross_all(genes1, genes2, fitness1, fitness2, 0)
+        # pylint: disable=protected-access
+        np.testing.assert_almost_equal(result, [
+            Chromosome._cross_(Chromosome(*c1), Chromosome(*c2), 0)
+            for c1, c2 in zip(zip(genes1, fitness1), zip(genes2, fitness2))])
+        mutated = Chromosome.cross_all(genes1, genes2, fitness1, fitness2, 1)
+        self.assertTrue(((mutated > -1) & (mutated < 1)).all())
+        self.assertFalse(np.isclose(mutated, result).any())
+
 if __name__ == '__main__':
     unittest.main()
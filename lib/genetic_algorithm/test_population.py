@@ -0,0 +1,229 @@
+"""
+Unit tests for population.py
+"""
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import io
+import json
+import os
+import random
+import tempfile
+import unittest
+
+import numpy as np
+
+from lib.evaluation_cache import EvaluationCache
+from lib.genetic_algorithm.metrics_sink import MetricsSink
+from lib.genetic_algorithm.population import Population
+from lib.genetic_algorithm.tetris_chromosome import TetrisChromosome
+
+def create_population(**kwargs):
+    """
+    Creates a small seeded population with the given Population options,
+    which does not print its generations unless asked to.
+    """
+    random.seed(0)
+    np.random.seed(0)
+    kwargs.setdefault('verbose', False)
+    return Population([
+        TetrisChromosome.random(n_simulations=2, max_simulation_length=30)
+        for _ in range(4)], **kwargs)
+
+def run_population(workers):
+    """
+    Runs a small seeded population for two generations, returning the
+    resulting fitnesses.
+    """
+    population = create_population(workers=workers)
+    population.run(2)
+    return [chromosome.get_fitness() for chromosome in population.population]
+
+class TestPopulation(unittest.TestCase):
+    def test_parallel_matches_serial(self):
+        self.assertEqual(run_population(workers=1), run_population(workers=2))
+
+    def test_cache_counts(self):
+        lookups = []
+        for workers in [1, 2]:
+            TetrisChromosome.evaluation_cache = EvaluationCache(1000)
+            try:
+                population = create_population(workers=workers)
+                population.run(1)
+            finally:
+                TetrisChromosome.evaluation_cache = None
+            # The lookups made in worker processes are counted too.
+            lookups.append(int(population.cache_counts.sum()))
+        self.assertGreater(lookups[0], 0)
+        self.assertEqual(lookups[0], lookups[1])
+
+    def test_lazy_fitness(self):
+        chromosome = TetrisChromosome.random(1, 50)
+        self.assertIsNone(chromosome.fitness)
+        self.assertIsNotNone(chromosome.get_fitness())
+        child = chromosome.cross(chromosome, 0)
+        self.assertIsNone(child.fitness)
+
+    def test_breed(self):
+        # pylint: disable=protected-access
+        population = create_population(mutation_chance=0)
+        survivors = population.population[2:]
+        population._breed_(np.array([1, 2, 3, 4], dtype=np.float64))
+        self.assertCountEqual(population.population[:2], survivors)
+        fittest = population.population[:2]
+        expected = (fittest[0].genes * 3 + fittest[1].genes * 4) / 7 \
+            if fittest[0] is survivors[0] else \
+            (fittest[0].genes * 4 + fittest[1].genes * 3) / 7
+        for child in population.population[2:]:
+            self.assertIsNone(child.fitness)
+            np.testing.assert_almost_equal(child.genes, expected)
+
+    def test_cross_unevaluated(self):
+        parents = [TetrisChromosome.random(1, 50) for _ in range(2)]
+        child = parents[0].cross(parents[1], 0)
+        for parent in parents:
+            self.assertIsNotNone(parent.fitness)
+        self.assertIsNone(child.fitness)
+        self.assertEqual(len(child.genes), len(parents[0].genes))
+
+    def test_cache_policy(self):
+        population = create_population(fitness_policy=Population.CACHE)
+        population.run(1)
+        previous = [(chromosome, chromosome.fitness)
+                    for chromosome in population.population]
+        population.run(1)
+        for chromosome, fitness in previous:
+            if chromosome in population.population:
+                self.assertEqual(chromosome.fitness, fitness)
+                self.assertEqual(len(chromosome.results), 2)
+
+    def test_accumulate_policy(self):
+        population = create_population(fitness_policy=Population.ACCUMULATE)
+        population.run(2)
+        n_results = sorted(len(chromosome.results)
+                           for chromosome in population.population)
+        # The children of the last generation have played one round of
+        # simulations, and the survivors have played at least two.
+        self.assertEqual(n_results[:2], [2, 2])
+        self.assertGreaterEqual(n_results[2], 4)
+        for chromosome in population.population:
+            self.assertEqual(chromosome.fitness, np.median(chromosome.results))
+
+    def test_common_random_numbers(self):
+        population = create_population(common_random_numbers=True)
+        genes = population.population[0].genes
+        for chromosome in population.population:
+            chromosome.genes = genes
+        population.run(0)
+        fitnesses = {chromosome.fitness
+                     for chromosome in population.population}
+        self.assertEqual(len(fitnesses), 1)
+
+    def test_checkpoint_resume(self):
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = os.path.join(directory, 'checkpoint.npz')
+            population = create_population(
+                fitness_policy=Population.ACCUMULATE)
+            population.run(3)
+            expected = [(chromosome.genes.tolist(), chromosome.results)
+                        for chromosome in population.population]
+            population = create_population(
+                fitness_policy=Population.ACCUMULATE)
+            population.run(1, checkpoint)
+            # Scramble the random state, as a new process would.
+            random.seed(1)
+            np.random.seed(1)
+            resumed = create_population(fitness_policy=Population.ACCUMULATE)
+            resumed.load_checkpoint(checkpoint)
+            self.assertEqual(resumed.generations, 1)
+            resumed.run(2, checkpoint)
+            self.assertEqual(
+                [(chromosome.genes.tolist(), chromosome.results)
+                 for chromosome in resumed.population], expected)
+            self.assertEqual(os.listdir(directory), ['checkpoint.npz'])
+
+    def test_checkpoint_mismatch(self):
+        with tempfile.TemporaryDirectory() as directory:
+            checkpoint = os.path.join(directory, 'checkpoint.npz')
+            create_population().save_checkpoint(checkpoint)
+            for chromosomes in [
+                    [TetrisChromosome.random(2, 30) for _ in range(8)],
+                    [TetrisChromosome.random(2, 30, features=('gaps',))
+                     for _ in range(4)]]:
+                with self.assertRaises(ValueError):
+                    Population(chromosomes, verbose=False).load_checkpoint(
+                        checkpoint)
+
+    def test_metrics(self):
+        stream = io.StringIO()
+        population = create_population(metrics=MetricsSink(stream))
+        population.run(2)
+        records = [json.loads(line) for line in stream.getvalue().split('\n')
+                   if line]
+        self.assertEqual([record['generation'] for record in records], [1, 2])
+        for record in records:
+            self.assertEqual(len(record['genes']), len(population.population))
+            self.assertEqual(record['best_fitness'], max(record['fitness']))
+            # Every chromosome is reevaluated with 2 simulations, but the
+            # first generation also evaluates the initial population.
+            self.assertIn(record['simulations'], (8, 16))
+            self.assertGreater(record['moves'], 0)
+
+    def test_racing(self):
+        population = create_population(racing=True)
+        population.run(2)
+        for chromosome in population.population:
+            self.assertIn(len(chromosome.results), (1, 2))
+
+    def test_steady_state(self):
+        runs = []
+        for workers in [1, 1, 2]:
+            stream = io.StringIO()
+            population = create_population(
+                workers=workers, steady_state=True,
+                metrics=MetricsSink(stream))
+            population.run(2)
+            self.assertEqual(population.generations, 2)
+            self.assertEqual(len(population.population), 4)
+            records = [json.loads(line)
+                       for line in stream.getvalue().split('\n') if line]
+            # The initial population and two children per generation.
+            self.assertEqual([record['simulations'] for record in records],
+                             [12, 4])
+            runs.append([chromosome.fitness
+                         for chromosome in population.population])
+        # One child at a time is deterministic.
+        self.assertEqual(runs[0], runs[1])
+
+    def test_replace_worst(self):
+        # pylint: disable=protected-access
+        population = create_population()
+        for chromosome, fitness in zip(population.population, [3, 1, 4, 2]):
+            chromosome.fitness = fitness
+        child = population._breed_child_()
+        self.assertIsNone(child.fitness)
+        child.fitness = 5
+        worst = population.population[1]
+        population._replace_worst_(child)
+        self.assertIs(population.population[1], child)
+        self.assertNotIn(worst, population.population)
+
+    def test_racing_uncertainty(self):
+        # pylint: disable=protected-access
+        chromosome = TetrisChromosome.random(n_simulations=4)
+        for results, cut_fitness, uncertain in [
+                ([10], 100, False),
+                ([90], 100, True),
+                ([300, 300], 100, False),
+                ([50, 250], 100, True)]:
+            chromosome.record_results(results)
+            self.assertEqual(
+                Population._is_uncertain_(chromosome, cut_fitness), uncertain)
+
+    def test_seeded_fitness(self):
+        chromosome = TetrisChromosome.random(1, 50)
+        self.assertEqual(chromosome.recalculate_fitness(7),
+                         chromosome.recalculate_fitness(7))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,152 @@
+"""
+Unit tests for tetris_chromosome.py
+"""
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import random
+import unittest
+
+import numpy as np
+
+from lib.bit_field import BitField
+from lib.evaluation_cache import EvaluationCache
+from lib.field import Field
+from lib.genetic_algorithm.tetris_chromosome import TetrisChromosome
+from lib.tetris_driver import TetrisDriver
+from lib.tetromino import ORIENTATIONS
+
+def random_field(seed, n_drops=30):
+    """
+    Returns a Field with a number of random drops applied to it.
+    """
+    rng = random.Random(seed)
+    field = Field.create()
+    for _ in range(n_drops):
+        field.drop(rng.choice(TetrisDriver.TETROMINOS),
+                   rng.randrange(Field.WIDTH))
+    return field
+
+class TestTetrisChromosome(unittest.TestCase):
+    def setUp(self):
+        self.chromosome = TetrisChromosome(
+            np.array([0.9, 0.5, 0.3, 0.2, 0.1]), 1, 1)
+
+    def test_placements(self):
+        for seed in range(5):
+            field = random_field(seed)
+            for orientations in ORIENTATIONS.values():
+                placements, boards = field.placements(orientations)
+                self.assertEqual(len(placements), len(boards))
+                for (orientation, column), board in zip(placements, boards):
+                    test_field = field.copy()
+                    self.assertGreaterEqual(
+                        test_field.drop(orientation.tetromino, column), 0)
+                    np.testing.assert_array_equal(
+                        test_field.state != 0, board)
+
+    def test_field_scores(self):
+        # pylint: disable=protected-access
+        for seed in range(5):
+            field = random_field(seed)
+            placements, boards = field.placements(ORIENTATIONS['T'])
+            scores = self.chromosome._get_field_scores_(boards)
+            for (orientation, column), score in zip(placements, scores):
+                test_field = field.copy()
+                test_field.drop(orientation.tetromino, column)
+                self.assertAlmostEqual(
+                    self.chromosome._get_field_score_(test_field), score)
+
+    def test_cached_totals_score(self):
+        # pylint: disable=protected-access
+        # Single fields are scored from the column totals they keep up to
+        # date, which must score the same as totals computed from scratch.
+        chromosome = TetrisChromosome.random(features=(
+            'gaps', 'mean_height', 'height_std', 'bumpiness', 'max_step'))
+        for field_class in [Field, BitField]:
+            rng = random.Random(0)
+            field = field_class.create()
+            for _ in range(200):
+                tetromino = rng.choice(TetrisDriver.TETROMINOS)
+                column = rng.randrange(Field.WIDTH)
+                if rng.random() < 0.3:
+                    record = field.place(tetromino, column)[1]
+                    if record is not None:
+                        field.undo(record)
+                elif field.drop(tetromino, column) < 0:
+                    field = field_class.create()
+                self.assertAlmostEqual(
+                    chromosome._get_field_score_(field),
+                    chromosome._get_field_score_(
+                        Field.create(field.state.copy())))
+
+    def test_evaluation_cache(self):
+        # pylint: disable=protected-access
+        field = random_field(0)
+        _, boards = field.placements(ORIENTATIONS['L'])
+        expected = self.chromosome._get_field_scores_(boards)
+        cache = EvaluationCache(2 * len(boards))
+        TetrisChromosome.evaluation_cache = cache
+        try:
+            # The first pass only misses and the second pass only hits.
+            for _ in range(2):
+                np.testing.assert_array_equal(
+                    self.chromosome._get_field_scores_(boards), expected)
+            self.assertEqual((cache.hits, cache.misses),
+                             (len(boards), len(boards)))
+            self.assertEqual(self.chromosome._get_field_score_(field),
+                             self.chromosome._get_field_score_(field))
+            self.assertEqual((cache.hits, cache.misses),
+                             (len(boards) + 1, len(boards) + 1))
+        finally:
+            TetrisChromosome.evaluation_cache = None
+
+    def test_strategy_callback(self):
+        field = BitField.create()
+        tetromino = TetrisDriver.TETROMINOS[0]
+        action = self.chromosome.strategy_callback(field, tetromino, None)
+        self.assertEqual(action.tetromino.type(), tetromino.type())
+        self.assertGreaterEqual(field.copy().drop(
+            action.tetromino, action.column), 0)
+
+    def test_lookahead(self):
+        # pylint: disable=protected-access
+        tetromino, next_tetromino = TetrisDriver.TETROMINOS[2:4]
+        for seed in range(3):
+            field = random_field(seed)
+            # A beam wide enough to keep every placement is an exhaustive
+            # search over both tetrominos.
+            chromosome = TetrisChromosome.create(
+                self.chromosome.genes, search_depth=2, beam_width=100)
+            placements, _ = field.placements(ORIENTATIONS[tetromino.type()])
+            best = []
+            for orientation, column in placements:
+                test_field = field.copy()
+                test_field.drop(orientation.tetromino, column)
+                _, boards = test_field.placements(
+                    ORIENTATIONS[next_tetromino.type()])
+                # Placements after which the game is lost are never chosen.
+                best.append(chromosome._get_field_scores_(boards).min()
+                            if len(boards) else np.inf)
+            expected = placements[np.argmin(best)]
+            action = chromosome.strategy_callback(
+                field, tetromino, None, [next_tetromino])
+            self.assertEqual((action.tetromino.type(), action.column),
+                             (expected[0].tetromino.type(), expected[1]))
+            np.testing.assert_array_equal(action.tetromino.state,
+                                          expected[0].tetromino.state)
+
+    def test_search_budget(self):
+        field = random_field(0)
+        tetromino = TetrisDriver.TETROMINOS[0]
+        greedy = self.chromosome.strategy_callback(field, tetromino, None)
+        chromosome = TetrisChromosome.create(
+            self.chromosome.genes, search_depth=3, max_search_nodes=1)
+        action = chromosome.strategy_callback(
+            field, tetromino, None, TetrisDriver.TETROMINOS[1:3])
+        self.assertEqual(action.column, greedy.column)
+        np.testing.assert_array_equal(action.tetromino.state,
+                                      greedy.tetromino.state)
+
+if __name__ == '__main__':
+    unittest.main()
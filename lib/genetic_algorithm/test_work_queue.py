@@ -0,0 +1,168 @@
+"""
+Unit tests for work_queue.py
+"""
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import contextlib
+import multiprocessing
+import multiprocessing.connection
+import os
+import tempfile
+import threading
+import unittest
+
+from lib.genetic_algorithm.population import Population
+from lib.genetic_algorithm.test_population import create_population, \
+    run_population
+from lib.genetic_algorithm.work_queue import WorkQueue, parse_address, work
+
+AUTHKEY = b'test'
+
+def start_workers(address, n_workers):
+    """
+    Starts the given number of worker processes connecting to the given
+    address, returning them.
+    """
+    workers = [multiprocessing.Process(target=work,
+                                       args=(address, AUTHKEY, 10))
+               for _ in range(n_workers)]
+    for worker in workers:
+        worker.start()
+    return workers
+
+def connect(address, authkey=AUTHKEY):
+    """
+    Connects to the given address as a worker, returning the connection.
+    """
+    family, address = parse_address(address)
+    return multiprocessing.connection.Client(address, family, authkey=authkey)
+
+def lose_task(address):
+    """
+    Connects to the given address as a worker, takes a task and disconnects
+    without returning its result.
+    """
+    with connect(address) as connection:
+        connection.recv()
+
+class TestWorkQueue(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    @contextlib.contextmanager
+    def run_workers(self, address, n_workers=2):
+        work_queue = WorkQueue.create(address, AUTHKEY)
+        workers = start_workers(work_queue.address, n_workers)
+        try:
+            yield work_queue
+        finally:
+            work_queue.close()
+            for worker in workers:
+                worker.join(10)
+                self.assertEqual(worker.exitcode, 0)
+
+    def test_starmap(self):
+        for address in ['127.0.0.1:0',
+                        os.path.join(self.directory.name, 'socket')]:
+            with self.run_workers(address) as work_queue:
+                self.assertEqual(
+                    work_queue.starmap(pow, [(2, i) for i in range(9)]),
+                    [2 ** i for i in range(9)])
+                with self.assertRaises(RuntimeError):
+                    work_queue.starmap(pow, [(2, 'a')])
+                self.assertEqual(work_queue.starmap(pow, [(3, 2)]), [9])
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_submit(self):
+        with self.run_workers('127.0.0.1:0') as work_queue:
+            futures = [work_queue.submit(pow, 2, i) for i in range(4)]
+            self.assertEqual([future.result(10) for future in futures],
+                             [1, 2, 4, 8])
+        with self.assertRaises(RuntimeError):
+            work_queue.submit(pow, 2, 2)
+
+    def test_lost_task(self):
+        work_queue = WorkQueue.create('127.0.0.1:0', AUTHKEY)
+        loser = threading.Thread(target=lose_task,
+                                 args=(work_queue.address,))
+        loser.start()
+        results = []
+        mapper = threading.Thread(target=lambda: results.extend(
+            work_queue.starmap(pow, [(2, i) for i in range(4)])))
+        mapper.start()
+        loser.join()
+        # A worker joining mid-batch picks up the lost task.
+        workers = start_workers(work_queue.address, 1)
+        mapper.join(10)
+        work_queue.close()
+        workers[0].join(10)
+        self.assertEqual(results, [1, 2, 4, 8])
+        self.assertEqual(work_queue.n_reassigned, 1)
+
+    def test_timeout(self):
+        work_queue = WorkQueue.create('127.0.0.1:0', AUTHKEY, timeout=0.2)
+        stalled = connect(work_queue.address)
+        workers = start_workers(work_queue.address, 1)
+        try:
+            self.assertEqual(
+                work_queue.starmap(pow, [(2, i) for i in range(4)]),
+                [1, 2, 4, 8])
+        finally:
+            work_queue.close()
+            stalled.close()
+            workers[0].join(10)
+
+    def test_authentication(self):
+        with self.run_workers('127.0.0.1:0', 1) as work_queue:
+            with self.assertRaises(multiprocessing.AuthenticationError):
+                connect(work_queue.address, b'wrong')
+            self.assertEqual(work_queue.starmap(pow, [(2, 3)]), [8])
+
+    def test_bad_reply(self):
+        work_queue = WorkQueue.create('127.0.0.1:0', AUTHKEY)
+        try:
+            for reply in [lambda connection: connection.send('result'),
+                          # A pickle of a module which does not exist.
+                          lambda connection: connection.send_bytes(
+                              b'cno_such_module\nthing\n.')]:
+                future = work_queue.submit(pow, 2, 3)
+                with connect(work_queue.address) as connection:
+                    connection.recv()
+                    reply(connection)
+                    with self.assertRaises(RuntimeError):
+                        future.result(10)
+        finally:
+            work_queue.close()
+
+    def test_parse_address(self):
+        self.assertEqual(parse_address('localhost:80'),
+                         ('AF_INET', ('localhost', 80)))
+        self.assertEqual(parse_address('/tmp/socket'),
+                         ('AF_UNIX', '/tmp/socket'))
+        for address in ['[::1]:80', '::1:80']:
+            with self.assertRaises(ValueError):
+                parse_address(address)
+
+    def test_population(self):
+        with self.run_workers('127.0.0.1:0', 3) as work_queue:
+            population = create_population(workers=4, work_queue=work_queue)
+            population.run(2)
+            self.assertEqual(
+                [chromosome.get_fitness()
+                 for chromosome in population.population],
+                run_population(workers=1))
+            population = create_population(
+                workers=4, work_queue=work_queue, racing=True,
+                fitness_policy=Population.ACCUMULATE)
+            population.run(1)
+            population = create_population(
+                workers=3, work_queue=work_queue, steady_state=True)
+            population.run(2)
+            self.assertEqual(len(population.population), 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -5,12 +5,18 @@ each position by the Chromosome's internal values (trained by a genetic
 algorithm).
 """
 
-import math
+import random
 
 import numpy as np
 
+from lib.batch_tetris_driver import BatchTetrisDriver, batch_placements, \
+    group_argmin
+from lib.bit_field import BitField
+from lib.features import DEFAULT_FEATURES, FeatureExtractor
 from lib.field import Field
+from lib.piece_source import PieceSource
 from lib.tetris_driver import TetrisDriver, TetrisAction
+from lib.tetromino import ORIENTATIONS
 from lib.genetic_algorithm.chromosome import Chromosome
 
 class TetrisChromosome(Chromosome): # pylint: disable=missing-class-docstring
@@ -18,118 +24,338 @@ class TetrisChromosome(Chromosome): # pylint: disable=missing-class-docstring
     N_SIMULATIONS = 4
     MAX_SIMULATION_LENGTH = 1000
 
-    N_FIELDS = 5
+    N_FIELDS = len(DEFAULT_FEATURES)
 
-    def __init__(self, genes, n_simulations, max_simulation_length):
-        Chromosome.__init__(self, genes)
+    # Settings of the beam search used when looking ahead at upcoming pieces.
+    # A search depth of 1 only considers the current piece.
+    SEARCH_DEPTH = 1
+    BEAM_WIDTH = 8
+    MAX_SEARCH_NODES = 2048
+
+    # An optional EvaluationCache shared by every TetrisChromosome. The input
+    # data points of a field do not depend on the genes, so cached values stay
+    # valid across chromosomes.
+    evaluation_cache = None
+
+    # An optional GameRecorder which every simulated game is recorded into.
+    game_recorder = None
+
+    def __init__(self, genes, n_simulations, max_simulation_length,
+                 piece_source=PieceSource.UNIFORM, hold=False,
+                 search_depth=SEARCH_DEPTH, beam_width=BEAM_WIDTH,
+                 max_search_nodes=MAX_SEARCH_NODES, features=DEFAULT_FEATURES):
+        """
+        Initializes a TetrisChromosome, whose games deal tetrominos from the
+        given kind of PieceSource, with a held tetromino if hold is True. Its
+        strategy looks ahead at up to search_depth - 1 upcoming tetrominos,
+        keeping the beam_width best fields of each ply and evaluating at most
+        about max_search_nodes fields per move. Fields are scored with the
+        named features, one per gene. Its fitness is not evaluated until it is
+        first needed.
+        """
+        Chromosome.__init__(self, genes, None)
+        self.features = tuple(features)
+        self.extractor = FeatureExtractor.create(self.features)
+        assert len(genes) == len(self.extractor)
         self.n_simulations = n_simulations
         self.max_simulation_length = max_simulation_length
-        self.recalculate_fitness()
+        self.piece_source = piece_source
+        self.hold = hold
+        self.search_depth = search_depth
+        self.beam_width = beam_width
+        self.max_search_nodes = max_search_nodes
 
     @staticmethod
     def create(genes, n_simulations=N_SIMULATIONS,
-               max_simulation_length=MAX_SIMULATION_LENGTH):
+               max_simulation_length=MAX_SIMULATION_LENGTH, **settings):
         """
         Factory method for creating a TetrisChromosome with a given gene
-        ndarray.
+        ndarray. Any other settings are passed on to the constructor.
         """
-        return TetrisChromosome(genes, n_simulations, max_simulation_length)
+        return TetrisChromosome(genes, n_simulations, max_simulation_length,
+                                **settings)
 
     @staticmethod
     def random(n_simulations=N_SIMULATIONS,
-               max_simulation_length=MAX_SIMULATION_LENGTH):
+               max_simulation_length=MAX_SIMULATION_LENGTH, **settings):
         """
-        Returns a TetrisChromosome with randomly seeded genes.
+        Returns a TetrisChromosome with randomly seeded genes, one per
+        feature. Any other settings are passed on to the constructor.
         """
         return TetrisChromosome(np.random.random_sample(
-            TetrisChromosome.N_FIELDS), n_simulations, max_simulation_length)
+            len(settings.get('features', DEFAULT_FEATURES))), n_simulations,
+                                max_simulation_length, **settings)
+
+    def _settings_(self):
+        """
+        Returns the settings this TetrisChromosome was created with, other than
+        its genes, as keyword arguments for the constructor.
+        """
+        return {
+            'n_simulations': self.n_simulations,
+            'max_simulation_length': self.max_simulation_length,
+            'piece_source': self.piece_source,
+            'hold': self.hold,
+            'search_depth': self.search_depth,
+            'beam_width': self.beam_width,
+            'max_search_nodes': self.max_search_nodes,
+            'features': self.features,
+        }
 
     def _get_field_score_(self, field):
         """
         Given a field, this helper method fetches all the input data points we
         care about from the field and computes the dot product of that input
         vector with the underlying Chromosome's genes to score the given field.
+        A single field comes without the move which led to it, so it can only
+        be scored with features which do not need moves. Its values are read
+        from the columns the field keeps up to date where possible.
         """
-        heights = field.heights()
-        ediff1d = np.ediff1d(heights)
-        field_values = np.array([
-            field.count_gaps(),            # Gap count
-            np.mean(heights),              # Average height
-            np.std(heights),               # Standard deviation of heights
-            heights.max() - heights.min(), # Max height diff
-            abs(ediff1d).max(),            # Max consecutive height diff
-        ])
-        assert len(field_values) == TetrisChromosome.N_FIELDS
+        cache = TetrisChromosome.evaluation_cache
+        if cache is not None and (field_values := cache.get(
+                key := (self.extractor.names, field.key()))) is not None:
+            return field_values.dot(self.genes)
+        field_values = self.extractor.field_values(field)
+        if cache is not None:
+            cache.put(key, field_values)
         return field_values.dot(self.genes)
 
-    def strategy_callback(self, field, tetromino, held_tetromino):
+    @staticmethod
+    def _get_field_values_(boards, extractor, moves=None):
+        """
+        Given a (n, HEIGHT, WIDTH) boolean np array of fields, and the moves
+        which led to them if the FeatureExtractor needs them, computes the
+        input data points of every field at once, returning them as a
+        (n, len(extractor)) np array.
+        """
+        return extractor.values(boards, moves)
+
+    @staticmethod
+    def _get_cached_field_values_(boards, extractor, moves=None):
+        """
+        Returns the same values as _get_field_values_(), using and filling
+        TetrisChromosome.evaluation_cache if one is set. Values which depend
+        on the moves that led to a field are never cached.
+        """
+        cache = TetrisChromosome.evaluation_cache
+        if cache is None or extractor.needs_moves:
+            return TetrisChromosome._get_field_values_(boards, extractor, moves)
+        # The cache is shared by every TetrisChromosome, whatever features it
+        # is scored with.
+        keys = [(extractor.names, key) for key in Field.board_keys(boards)]
+        values = np.empty((len(boards), len(extractor)))
+        missing = []
+        for i, key in enumerate(keys):
+            if (cached := cache.get(key)) is None:
+                missing.append(i)
+            else:
+                values[i] = cached
+        if missing:
+            values[missing] = TetrisChromosome._get_field_values_(
+                boards[missing], extractor)
+            for i in missing:
+                cache.put(keys[i], values[i].copy())
+        return values
+
+    def _get_field_scores_(self, boards, moves=None):
+        """
+        Scores every field in a (n, HEIGHT, WIDTH) boolean np array of fields,
+        given the moves which led to them if any feature needs them, with the
+        underlying Chromosome's genes.
+        """
+        return (TetrisChromosome._get_cached_field_values_(
+            boards, self.extractor, moves) * self.genes).sum(axis=1)
+
+    def _search_(self, boards, scores, preview):
+        """
+        Looks ahead from each of the given candidate fields by placing the
+        tetrominos in preview in order, with a beam search which only expands
+        the beam_width best scoring fields of each ply. Returns the best score
+        reached from each candidate field at the deepest ply the search
+        reached, or inf for the candidates pruned from the beam.
+
+        The search stops early once it has evaluated max_search_nodes fields,
+        or when none of the fields in the beam can place the next tetromino.
+        """
+        n_candidates = n_nodes = len(boards)
+        roots = np.arange(n_candidates)
+        for tetromino in preview:
+            if n_nodes >= self.max_search_nodes:
+                break
+            beam = np.argsort(scores, kind='stable')[:self.beam_width]
+            owners, _, _, children, *moves = batch_placements(
+                boards[beam], [tetromino.type()] * len(beam),
+                self.extractor.needs_moves)
+            if len(children) == 0:
+                break
+            roots, boards = roots[beam][owners], children
+            scores = self._get_field_scores_(boards, *moves)
+            n_nodes += len(boards)
+        best = np.full(n_candidates, np.inf)
+        np.minimum.at(best, roots, scores)
+        return best
+
+    def strategy_callback(self, field, tetromino, held_tetromino, preview=()):
         """
         This callback is passed into TetrisDriver in order to play an actual
         game of Tetris using this class's underlying Chromosome to decide the
         positioning of the next Tetromino.
 
-        This callback takes the current field, tetromino, and held tetromino and
-        calculates the best tetromino (and orientation) position to play.
+        This callback takes the current field, tetromino, held tetromino and
+        the upcoming tetrominos, if any are known, and calculates the best
+        tetromino (and orientation) position to play. With a search depth
+        above 1, each position is judged by the best field reachable from it
+        after also placing the upcoming tetrominos.
         """
-        candidates = [
-            tetromino,
-            tetromino.copy().rotate_right(),
-            tetromino.copy().flip(),
-            tetromino.copy().rotate_left(),
-        ]
+        # Only the distinct orientations of each tetromino are considered.
+        candidates = ORIENTATIONS[tetromino.type()]
         if held_tetromino is not None and (
                 held_tetromino.tetromino_type != tetromino.tetromino_type):
-            candidates += [
-                held_tetromino,
-                held_tetromino.copy().rotate_right(),
-                held_tetromino.copy().flip(),
-                held_tetromino.copy().rotate_left(),
-            ]
-        best_column = None
-        best_tetromino_orientation = None
-        best_field_score = math.inf
-        for candidate in candidates:
-            for column in range(Field.WIDTH):
-                test_field = field.copy()
-                # Scenario where this is an invalid column to drop into
-                if test_field.drop(candidate, column) < 0:
-                    continue
-                # Get the field score and with this chromosome's genetic values
-                # applied to it and try to minimize it.
-                field_score = self._get_field_score_(test_field)
-                if field_score < best_field_score:
-                    best_column = column
-                    best_tetromino_orientation = candidate
-                    best_field_score = field_score
-        if best_column is None:
+            candidates = candidates + ORIENTATIONS[held_tetromino.type()]
+        # Score the fields resulting from every placement in a single batch
+        # and try to minimize the score.
+        placements, boards, *moves = field.placements(
+            candidates, self.extractor.needs_moves)
+        if not placements:
             return None
-        return TetrisAction(best_tetromino_orientation, best_column)
+        scores = self._get_field_scores_(boards, *moves)
+        if self.search_depth > 1 and preview:
+            scores = self._search_(
+                boards, scores, preview[:self.search_depth - 1])
+        orientation, column = placements[np.argmin(scores)]
+        return TetrisAction(orientation.tetromino, column)
+
+    def child(self, genes):
+        """
+        Returns a new TetrisChromosome with the given genes and the settings of
+        this one.
+        """
+        return TetrisChromosome(genes, **self._settings_())
+
+    def __getstate__(self):
+        """
+        Only the genes and simulation settings are pickled, which is all that
+        is needed to evaluate a TetrisChromosome in another process.
+        """
+        return {'genes': self.genes, **self._settings_()}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.extractor = FeatureExtractor.create(self.features)
+        self.fitness = None
+        self.results = []
+
+    def _game_seeds_(self, seed, n_simulations=None):
+        """
+        Returns the seed of each of the given number of games, by default
+        n_simulations. Every game gets its own seed drawn from the given seed,
+        so that the games are reproducible in any process and in any order. If
+        no seed is given, every game seed is None.
+        """
+        if n_simulations is None:
+            n_simulations = self.n_simulations
+        if seed is None:
+            return [None] * n_simulations
+        seeder = random.Random(seed)
+        return [seeder.getrandbits(64) for _ in range(n_simulations)]
 
-    def cross(self, other, mutation_chance):
+    def _piece_sources_(self, game_seeds):
         """
-        Performs genetic crossing between two TetrisChromosomes using the
-        underlying Chromosome.cross() implementation.
+        Returns the PieceSource each game with the given seed will deal its
+        tetrominos from. Sources of games without a seed draw from the random
+        module.
         """
-        return TetrisChromosome(
-            Chromosome._cross_(self, other, mutation_chance),
-            self.n_simulations,
-            self.max_simulation_length)
+        return [PieceSource.create(self.piece_source, game_seed)
+                for game_seed in game_seeds]
 
-    def recalculate_fitness(self):
+    def simulate(self, seed=None, n_simulations=None):
         """
-        Performs a simulation to evaluate the fitness of the chromosome. This
-        will be called multiple times and the overall performance of the
-        chromosome is the median of all the runs.
+        Plays n_simulations games of Tetris with this chromosome's strategy,
+        unless another number of games is given, returning the score of each
+        game.
 
-        For a TetrisChromosome, the fitness of the chromosome is the number of
-        Tetrominos it can place before losing plus the number of lines cleared.
+        For a TetrisChromosome, the score of a game is the number of Tetrominos
+        it can place before losing plus the number of lines cleared.
         """
-        fitnesses = []
-        for _ in range(self.n_simulations):
-            driver = TetrisDriver.create()
+        recorder = TetrisChromosome.game_recorder
+        game_seeds = self._game_seeds_(seed, n_simulations)
+        scores, records = [], []
+        for game_seed, pieces in zip(game_seeds,
+                                     self._piece_sources_(game_seeds)):
+            record = None if recorder is None else \
+                recorder.start(game_seed, self.max_simulation_length)
+            driver = TetrisDriver.create(BitField.create(), pieces,
+                                         self.search_depth - 1, self.hold,
+                                         record)
             for sim_length in range(self.max_simulation_length):
                 if not driver.play(self.strategy_callback):
                     break
-            fitnesses.append(sim_length + driver.lines_cleared)
-        self.fitness = np.median(fitnesses)
-        return self.fitness
+            scores.append(sim_length + driver.lines_cleared)
+            TetrisChromosome.n_moves += driver.num_placed
+            if record is not None:
+                records.append(record)
+        if records:
+            recorder.write(records)
+        return scores
+
+    @staticmethod
+    def simulate_all(chromosomes, seeds, n_simulations=None):
+        """
+        Plays the games of all the given TetrisChromosomes together in a
+        BatchTetrisDriver, returning the same scores that calling simulate() on
+        each of them with the corresponding seed would.
+
+        Chromosomes which look ahead, or which differ in whether they hold or
+        in their features, play their games one at a time with simulate()
+        instead.
+        """
+        # pylint: disable=protected-access
+        if any(chromosome.search_depth > 1 or
+               chromosome.hold != chromosomes[0].hold or
+               chromosome.extractor is not chromosomes[0].extractor
+               for chromosome in chromosomes):
+            return [chromosome.simulate(seed, n_simulations)
+                    for chromosome, seed in zip(chromosomes, seeds)]
+        recorder = TetrisChromosome.game_recorder
+        game_seeds = [chromosome._game_seeds_(seed, n_simulations)
+                      for chromosome, seed in zip(chromosomes, seeds)]
+        pieces = [chromosome._piece_sources_(chromosome_seeds)
+                  for chromosome, chromosome_seeds in zip(chromosomes,
+                                                          game_seeds)]
+        records = None if recorder is None else [
+            recorder.start(game_seed, chromosome.max_simulation_length)
+            for chromosome, chromosome_seeds in zip(chromosomes, game_seeds)
+            for game_seed in chromosome_seeds]
+        owners = np.repeat(np.arange(len(chromosomes)), [
+            len(game_pieces) for game_pieces in pieces])
+        genes = np.array([chromosome.genes for chromosome in chromosomes])
+        max_lengths = np.array([chromosome.max_simulation_length
+                                for chromosome in chromosomes])[owners]
+        driver = BatchTetrisDriver.create(
+            [source for game_pieces in pieces for source in game_pieces],
+            max_lengths, chromosomes[0].hold, records)
+        extractor = chromosomes[0].extractor
+        def strategy(games, boards, *moves):
+            return group_argmin(games, (
+                TetrisChromosome._get_cached_field_values_(
+                    boards, extractor, *moves) *
+                genes[owners[games]]).sum(axis=1))
+        while driver.play(strategy, extractor.needs_moves):
+            pass
+        TetrisChromosome.n_moves += int(driver.num_placed.sum())
+        if records:
+            recorder.write(records)
+        # A game which reaches max_simulation_length is scored the same way
+        # simulate() scores it.
+        scores = np.minimum(driver.num_placed, max_lengths - 1) + \
+            driver.lines_cleared
+        return [scores[owners == i].tolist() for i in range(len(chromosomes))]
+
+    def record_results(self, results, accumulate=False):
+        """
+        The fitness of a TetrisChromosome is the median score of all the games
+        it has played, which is either the given games or, if accumulate is
+        True, every game it has played since its fitness was last recalculated.
+        """
+        self.results = self.results + results if accumulate else results
+        self.fitness = np.median(self.results)
@@ -0,0 +1,265 @@
+"""
+File containing the WorkQueue class, an Executor which hands evaluation tasks
+out to worker processes connected over a TCP or Unix socket, possibly on other
+machines, and the work() loop those workers run.
+
+Tasks and results are pickled, so connections are made with
+multiprocessing.connection, which only accepts peers proving they know the
+shared authentication key before anything is unpickled.
+"""
+
+import collections
+import concurrent.futures
+import functools
+import multiprocessing.connection
+import os
+import threading
+import time
+import traceback
+
+# The environment variable train.py and worker.py read the authentication key
+# from.
+AUTHKEY_VARIABLE = 'TETRIS_WORK_QUEUE_KEY'
+
+def parse_address(address):
+    """
+    Returns the multiprocessing.connection family and address of the given
+    address string, which is either host:port for TCP or the path of a Unix
+    socket. Raises a ValueError for IPv6 addresses, which
+    multiprocessing.connection does not support.
+    """
+    host, _, port = address.rpartition(':')
+    if host and port.isdigit():
+        if host.startswith('[') or ':' in host:
+            raise ValueError('IPv6 addresses are not supported: ' + address)
+        return 'AF_INET', (host, int(port))
+    return 'AF_UNIX', address
+
+class WorkQueue(concurrent.futures.Executor):
+    # pylint: disable=missing-class-docstring
+
+    def __init__(self, listener, authkey, timeout=None):
+        """
+        Initializes a WorkQueue handing tasks out to the workers which connect
+        to the given multiprocessing.connection.Listener with the given
+        authentication key. Invoke WorkQueue.create() instead.
+        """
+        self.listener = listener
+        self.authkey = authkey
+        self.timeout = timeout
+        self.condition = threading.Condition()
+        # The pending tasks as (future, function, args) tuples.
+        self.tasks = collections.deque()
+        self.closed = False
+        self.n_workers = 0
+        self.n_reassigned = 0
+        threading.Thread(target=self._accept_, daemon=True).start()
+
+    @staticmethod
+    def create(address, authkey, timeout=None):
+        """
+        Factory method returning a WorkQueue listening on the given address,
+        either host:port for TCP, where port 0 picks a free port, or the path
+        of a Unix socket, for workers knowing the given bytes authentication
+        key. A task whose worker has not returned its result within timeout
+        seconds is handed to another worker, and the first worker is dropped.
+        """
+        family, address = parse_address(address)
+        if family == 'AF_UNIX' and os.path.exists(address):
+            os.unlink(address)
+        # Connections are authenticated in their own threads, so that a peer
+        # stalling the handshake cannot hold up the others.
+        return WorkQueue(multiprocessing.connection.Listener(
+            address, family, backlog=64), authkey, timeout)
+
+    @property
+    def address(self):
+        """
+        The address workers connect to, in the form WorkQueue.create() takes.
+        """
+        address = self.listener.address
+        if isinstance(address, tuple):
+            return '{}:{}'.format(*address[:2])
+        return address
+
+    def _accept_(self):
+        """
+        Accepts worker connections until the WorkQueue is closed, serving
+        each of them in its own thread.
+        """
+        while True:
+            try:
+                connection = self.listener.accept()
+            except OSError:
+                if self.closed:
+                    return
+                continue
+            threading.Thread(target=self._serve_, args=(connection,),
+                             daemon=True).start()
+
+    def _next_task_(self):
+        """
+        Waits for a pending task which has not been cancelled and returns it,
+        or returns None once the WorkQueue is closed.
+        """
+        with self.condition:
+            while True:
+                self.condition.wait_for(lambda: self.tasks or self.closed)
+                if self.closed:
+                    return None
+                task = self.tasks.popleft()
+                if task[0].running() or task[0].set_running_or_notify_cancel():
+                    return task
+
+    def _requeue_(self, task):
+        """
+        Puts a task whose worker was lost back at the front of the queue.
+        """
+        with self.condition:
+            self.tasks.appendleft(task)
+            self.n_reassigned += 1
+            self.condition.notify_all()
+
+    def _serve_(self, connection):
+        """
+        Sends pending tasks to the worker on the given connection one at a
+        time, until the WorkQueue is closed or the worker is dropped. A task
+        whose worker is lost or times out goes back to the front of the
+        queue, and a task whose worker sends back a reply which is not a
+        result fails with a RuntimeError. Workers which fail to authenticate
+        are dropped before anything they send is unpickled.
+        """
+        try:
+            multiprocessing.connection.deliver_challenge(connection,
+                                                         self.authkey)
+            multiprocessing.connection.answer_challenge(connection,
+                                                        self.authkey)
+        except (multiprocessing.AuthenticationError, OSError, EOFError):
+            connection.close()
+            return
+        with self.condition:
+            self.n_workers += 1
+        try:
+            with connection:
+                while (task := self._next_task_()) is not None:
+                    future, function, args = task
+                    try:
+                        connection.send((function, args))
+                        if not connection.poll(self.timeout):
+                            raise TimeoutError('The worker timed out')
+                        reply = connection.recv()
+                    except (OSError, EOFError):
+                        self._requeue_(task)
+                        return
+                    except Exception: # pylint: disable=broad-except
+                        future.set_exception(RuntimeError(
+                            'Bad reply from a worker:\n' +
+                            traceback.format_exc()))
+                        return
+                    try:
+                        succeeded, result = reply
+                    except (TypeError, ValueError):
+                        future.set_exception(RuntimeError(
+                            'Bad reply from a worker: {!r}'.format(reply)))
+                        return
+                    if succeeded:
+                        future.set_result(result)
+                    else:
+                        future.set_exception(RuntimeError(
+                            'Task failed in a worker:\n{}'.format(result)))
+                try:
+                    connection.send(None)
+                except OSError:
+                    pass
+        finally:
+            with self.condition:
+                self.n_workers -= 1
+
+    def submit(self, fn, /, *args, **kwargs):
+        """
+        Schedules the given function to be called with the given arguments in
+        one of the connected workers, returning a concurrent.futures.Future
+        of its result. The function must be importable by the workers. The
+        future raises a RuntimeError if the function raises in the worker.
+        """
+        future = concurrent.futures.Future()
+        with self.condition:
+            if self.closed:
+                raise RuntimeError('The WorkQueue was closed')
+            self.tasks.append((future, functools.partial(fn, **kwargs)
+                               if kwargs else fn, args))
+            self.condition.notify_all()
+        return future
+
+    def starmap(self, function, iterable):
+        """
+        Like multiprocessing.Pool.starmap(), calls the given function with
+        each of the given tuples of arguments in the connected workers and
+        returns the list of results in order, waiting for workers to connect
+        if there are none.
+        """
+        futures = [self.submit(function, *args) for args in iterable]
+        return [future.result() for future in futures]
+
+    def close(self):
+        """
+        Stops accepting workers and tells the connected workers to exit once
+        they are done with their current task. Tasks no worker has started
+        fail with a RuntimeError.
+        """
+        with self.condition:
+            self.closed = True
+            for future, _, _ in self.tasks:
+                if not future.done():
+                    future.set_exception(
+                        RuntimeError('The WorkQueue was closed'))
+            self.tasks.clear()
+            self.condition.notify_all()
+        self.listener.close()
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        """
+        Closes the WorkQueue, for use as a concurrent.futures.Executor.
+        """
+        self.close()
+
+def work(address, authkey, connect_timeout=60):
+    """
+    Connects to the WorkQueue at the given address with the given bytes
+    authentication key, retrying for up to connect_timeout seconds, and runs
+    the tasks it hands out until it is closed. Returns the number of tasks
+    run.
+    """
+    family, address = parse_address(address)
+    deadline = time.monotonic() + connect_timeout
+    while True:
+        try:
+            connection = multiprocessing.connection.Client(
+                address, family, authkey=authkey)
+            break
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+    n_tasks = 0
+    with connection:
+        while True:
+            try:
+                task = connection.recv()
+            except (OSError, EOFError):
+                return n_tasks
+            if task is None:
+                return n_tasks
+            function, args = task
+            try:
+                result = (True, function(*args))
+            except Exception: # pylint: disable=broad-except
+                result = (False, traceback.format_exc())
+            try:
+                connection.send(result)
+            except (OSError, EOFError):
+                return n_tasks
+            except Exception: # pylint: disable=broad-except
+                # The result could not be pickled.
+                connection.send((False, traceback.format_exc()))
+            n_tasks += 1
@@ -0,0 +1,125 @@
+"""
+The move table holds every (orientation, column) placement of every tetromino
+as flat np arrays, precomputed once at import, so that the legal placements of
+a tetromino in one or many fields come from table lookups and array operations
+instead of testing the field cell by cell.
+
+A field is 10 columns wide, so each of its rows is one of 1024 bitmasks. Rows
+are stored as bitmasks wherever possible: a placement collides with a row
+exactly when the bitwise and of the row and the placement's row mask is
+nonzero, and ROW_BITS expands a bitmask back into the filled spaces of a row.
+"""
+
+import numpy as np
+
+from lib.field import Field
+from lib.tetromino import ORIENTATIONS
+
+def _build_move_table_():
+    """
+    Builds the tables of every placement. Placements of the same orientation,
+    and of the same tetromino type, are contiguous and ordered the same way
+    Field.placements() orders them.
+    """
+    placements, starts, ends, spans = [], {}, {}, {}
+    for tetromino_type, orientations in ORIENTATIONS.items():
+        starts[tetromino_type] = len(placements)
+        for orientation in orientations:
+            start = len(placements)
+            for column in range(Field.WIDTH - orientation.width + 1):
+                placements.append((orientation, column))
+            spans[orientation.tetromino.type(), orientation.rotation] = \
+                np.arange(start, len(placements))
+        ends[tetromino_type] = len(placements)
+    # Every tetromino is at most 4 columns wide and 4 rows high and has exactly
+    # 4 spaces. The columns of narrower tetrominos are padded with a bottom
+    # offset which never determines the landing row, and the rows of shorter
+    # tetrominos are padded with empty row masks.
+    columns = np.zeros((len(placements), 4), dtype=np.int64)
+    bottoms = np.full((len(placements), 4), -Field.HEIGHT, dtype=np.int64)
+    cell_rows = np.zeros((len(placements), 4), dtype=np.int64)
+    cell_cols = np.zeros((len(placements), 4), dtype=np.int64)
+    heights = np.zeros(len(placements), dtype=np.int64)
+    row_masks = np.zeros((len(placements), 4), dtype=np.int64)
+    for i, (orientation, column) in enumerate(placements):
+        columns[i] = column
+        columns[i, :orientation.width] += np.arange(orientation.width)
+        bottoms[i, :orientation.width] = orientation.bottoms
+        cell_rows[i], cell_cols[i] = orientation.cells
+        cell_cols[i] += column
+        heights[i] = orientation.height
+        row_masks[i, :orientation.height] = [
+            mask << column for mask in orientation.row_masks]
+    return placements, starts, ends, spans, columns, bottoms, cell_rows, \
+        cell_cols, heights, row_masks
+
+(PLACEMENTS, STARTS, ENDS, SPANS, COLUMNS, BOTTOMS, CELL_ROWS, CELL_COLS,
+ HEIGHTS, ROW_MASKS) = _build_move_table_()
+
+# The filled spaces of each of the 1024 possible rows, indexed by bitmask.
+ROW_BITS = (np.arange(1 << Field.WIDTH)[:, np.newaxis] >>
+            np.arange(Field.WIDTH) & 1).astype(bool)
+
+def orientation_ids(orientations):
+    """
+    Returns the PLACEMENTS indices of every placement of the given
+    Orientations, in order.
+    """
+    return np.concatenate([
+        SPANS[orientation.tetromino.type(), orientation.rotation]
+        for orientation in orientations])
+
+def landing_rows(heights, owners, ids):
+    """
+    Given a (n_fields, WIDTH) np array of column heights, and the field index
+    and PLACEMENTS index of each placement, returns the row the top of each
+    placed tetromino comes to rest in, found from the heights of the columns
+    it covers. This is only exact when the row is at least the height of the
+    tetromino; otherwise the drop row has to be found by scanning.
+    """
+    return Field.HEIGHT - 1 - (heights[owners[:, np.newaxis], COLUMNS[ids]] +
+                               BOTTOMS[ids]).max(axis=1)
+
+def _first_collisions_(collisions, ids):
+    """
+    Given a (n, HEIGHT) boolean np array of whether each placement collides
+    with its field when its top is in each row, returns the drop row in the
+    same way as Field._scan_drop_row_(), or -1 if the placement collides in
+    the row the tetromino enters the field at.
+    """
+    # Only collisions at or below the row the tetromino enters at count.
+    collisions &= np.arange(Field.HEIGHT) >= HEIGHTS[ids][:, np.newaxis]
+    first_collision = np.where(collisions.any(axis=1),
+                               collisions.argmax(axis=1), Field.HEIGHT)
+    return np.where(first_collision == HEIGHTS[ids], -1, first_collision - 1)
+
+def scan_drop_rows(fields, ids):
+    """
+    Finds the drop row of each of the given PLACEMENTS in the corresponding
+    field of a (n, HEIGHT, WIDTH) boolean np array of fields in the same way
+    as Field._scan_drop_row_(), by testing every row the tetromino could
+    occupy at once.
+    """
+    rows = np.arange(Field.HEIGHT)
+    cell_rows = rows[np.newaxis, :, np.newaxis] + \
+        CELL_ROWS[ids][:, np.newaxis, :]
+    in_bounds = cell_rows < Field.HEIGHT
+    collisions = ~in_bounds.all(axis=2) | fields[
+        np.arange(len(ids))[:, np.newaxis, np.newaxis],
+        np.where(in_bounds, cell_rows, 0),
+        CELL_COLS[ids][:, np.newaxis, :]].any(axis=2)
+    return _first_collisions_(collisions, ids)
+
+def scan_drop_rows_bits(rows, ids):
+    """
+    Finds the drop row of each of the given PLACEMENTS in a field given as a
+    list of HEIGHT row bitmasks, in the same way as Field._scan_drop_row_(),
+    by testing the row masks of every placement against every row at once.
+    """
+    # Rows past the bottom of the field are full, so that every placement
+    # which extends past it collides.
+    padded = np.array(rows + [(1 << Field.WIDTH) - 1] * 4)
+    windows = padded[np.arange(Field.HEIGHT)[:, np.newaxis] + np.arange(4)]
+    collisions = (windows[np.newaxis] &
+                  ROW_MASKS[ids][:, np.newaxis, :]).any(axis=2)
+    return _first_collisions_(collisions, ids)
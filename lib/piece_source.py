@@ -0,0 +1,105 @@
+"""
+Piece sources decide the sequence of tetrominos a TetrisDriver deals. Each
+source is either seeded, so its sequence can be reproduced in any process, or
+draws from the random module.
+"""
+
+import random
+
+from lib.tetromino import Tetromino
+
+# The tetrominos every piece source deals, in their spawn orientations.
+TETROMINOS = [
+    Tetromino.ITetromino(),
+    Tetromino.OTetromino(),
+    Tetromino.TTetromino(),
+    Tetromino.STetromino(),
+    Tetromino.ZTetromino(),
+    Tetromino.JTetromino(),
+    Tetromino.LTetromino()
+]
+
+class PieceSource(): # pylint: disable=missing-class-docstring
+
+    UNIFORM = 'uniform'
+    BAG = 'bag'
+    KINDS = [UNIFORM, BAG]
+
+    @staticmethod
+    def create(kind=UNIFORM, seed=None):
+        """
+        Factory method to create a piece source of the given kind, drawing from
+        a random.Random seeded with the given seed, or from the random module
+        if no seed is given.
+        """
+        rng = random if seed is None else random.Random(seed)
+        if kind == PieceSource.UNIFORM:
+            return UniformPieceSource(rng)
+        if kind == PieceSource.BAG:
+            return BagPieceSource(rng)
+        raise ValueError('No PieceSource of kind {}'.format(kind))
+
+    def next(self): # pylint: disable=missing-function-docstring
+        raise NotImplementedError('Method not implemented!')
+
+class UniformPieceSource(PieceSource): # pylint: disable=missing-class-docstring
+
+    def __init__(self, rng):
+        """
+        Initializes a piece source which deals every tetromino independently
+        and uniformly at random.
+        """
+        self.rng = rng
+
+    def next(self):
+        """
+        Returns the next tetromino.
+        """
+        return self.rng.choice(TETROMINOS)
+
+class BagPieceSource(PieceSource): # pylint: disable=missing-class-docstring
+
+    def __init__(self, rng):
+        """
+        Initializes a piece source which deals the seven tetrominos in a random
+        order, then deals them again in a new random order, and so on.
+        """
+        self.rng = rng
+        self.bag = []
+
+    def next(self):
+        """
+        Returns the next tetromino, refilling the bag if it is empty.
+        """
+        if not self.bag:
+            self.bag = TETROMINOS.copy()
+            self.rng.shuffle(self.bag)
+        return self.bag.pop()
+
+class SequencePieceSource(PieceSource): # pylint: disable=missing-class-docstring
+
+    def __init__(self, sequence):
+        """
+        Initializes a piece source which deals the tetrominos of a precomputed
+        sequence in order, starting over once it is exhausted.
+        """
+        assert len(sequence) > 0
+        self.sequence = sequence
+        self.index = 0
+
+    @staticmethod
+    def generate(length, kind=PieceSource.UNIFORM, seed=None):
+        """
+        Precomputes a sequence of the given length from a piece source of the
+        given kind and seed.
+        """
+        source = PieceSource.create(kind, seed)
+        return SequencePieceSource([source.next() for _ in range(length)])
+
+    def next(self):
+        """
+        Returns the next tetromino in the sequence.
+        """
+        tetromino = self.sequence[self.index % len(self.sequence)]
+        self.index += 1
+        return tetromino
@@ -0,0 +1,81 @@
+"""
+The TerminalRenderer class draws a Field on an ANSI terminal. The whole field
+is drawn once, and every later frame only redraws the spaces that changed
+since the previous one, at no more than a given number of frames per second.
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from lib.field import Field
+
+class TerminalRenderer(): # pylint: disable=missing-class-docstring
+
+    DEFAULT_FPS = 10
+
+    # The screen line of the top row of the field and the screen column of its
+    # leftmost column, counting from 1, in the layout of Field.__str__().
+    TOP = 2
+    LEFT = 5
+
+    def __init__(self, stream, fps):
+        """
+        Initializes a TerminalRenderer writing to the given text stream,
+        drawing at most fps frames per second, or as fast as possible if fps
+        is not positive. Invoke TerminalRenderer.create() instead.
+        """
+        self.stream = stream
+        self.frame_time = 1 / fps if fps > 0 else 0
+        self.next_frame = 0
+        self.previous = None
+
+    @staticmethod
+    def create(stream=None, fps=DEFAULT_FPS):
+        """
+        Factory method to create a TerminalRenderer, writing to stdout unless
+        another text stream is given.
+        """
+        return TerminalRenderer(sys.stdout if stream is None else stream, fps)
+
+    def _wait_(self):
+        """
+        Sleeps until the next frame is due, keeping the frame rate steady
+        however long the time between frames took.
+        """
+        if not self.frame_time:
+            return
+        now = time.perf_counter()
+        if now < self.next_frame:
+            time.sleep(self.next_frame - now)
+        self.next_frame = max(now, self.next_frame) + self.frame_time
+
+    def render(self, field, status=''):
+        """
+        Draws a frame of the given field, followed by a status line.
+        """
+        self._wait_()
+        state = field.state
+        if self.previous is None:
+            frame = '\x1b[2J\x1b[H' + str(field)
+        else:
+            changed = state != self.previous
+            frame = ''.join(
+                f'\x1b[{TerminalRenderer.TOP + row};'
+                f'{TerminalRenderer.LEFT + 2 * column}H{char}'
+                for row, column, char in zip(
+                    *np.nonzero(changed), field.CHARS[state[changed]]))
+        frame += f'\x1b[{TerminalRenderer.TOP + Field.HEIGHT + 1};1H' \
+                 f'\x1b[K{status}'
+        self.stream.write(frame)
+        self.stream.flush()
+        self.previous = state.copy()
+
+    def close(self):
+        """
+        Moves the cursor past the last frame, so that later output follows it.
+        """
+        if self.previous is not None:
+            self.stream.write('\n')
+            self.stream.flush()
@@ -0,0 +1,56 @@
+"""
+Unit tests for batch_tetris_driver.py
+"""
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import unittest
+
+import numpy as np
+
+from lib.batch_tetris_driver import BatchTetrisDriver, group_argmin
+from lib.genetic_algorithm.tetris_chromosome import TetrisChromosome
+from lib.piece_source import PieceSource
+
+class TestBatchTetrisDriver(unittest.TestCase):
+    def test_group_argmin(self):
+        groups = np.array([0, 0, 0, 2, 2, 5])
+        values = np.array([3, 1, 1, 0, -1, 7])
+        np.testing.assert_array_equal(group_argmin(groups, values), [1, 4, 5])
+
+    def test_max_placed(self):
+        driver = BatchTetrisDriver.create(
+            [PieceSource.create(seed=i) for i in range(3)],
+            max_placed=[1, 2, 3])
+        def strategy(games, _):
+            return group_argmin(games, np.zeros(len(games)))
+        while driver.play(strategy):
+            pass
+        np.testing.assert_array_equal(driver.num_placed, [1, 2, 3])
+        self.assertEqual(driver.fields.sum(), 4 * 6)
+
+    def assert_matches_tetris_driver(self, **settings):
+        np.random.seed(0)
+        chromosomes = [
+            TetrisChromosome.random(n_simulations=3, max_simulation_length=60,
+                                    **settings)
+            for _ in range(4)]
+        seeds = list(range(len(chromosomes)))
+        self.assertEqual(
+            TetrisChromosome.simulate_all(chromosomes, seeds),
+            [chromosome.simulate(seed)
+             for chromosome, seed in zip(chromosomes, seeds)])
+
+    def test_matches_tetris_driver(self):
+        self.assert_matches_tetris_driver()
+
+    def test_matches_tetris_driver_with_hold(self):
+        self.assert_matches_tetris_driver(hold=True)
+
+    def test_matches_tetris_driver_with_move_features(self):
+        self.assert_matches_tetris_driver(
+            hold=True, features=('gaps', 'wells', 'row_transitions',
+                                 'landing_height', 'eroded_cells'))
+
+if __name__ == '__main__':
+    unittest.main()
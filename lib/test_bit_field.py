@@ -0,0 +1,102 @@
+"""
+Unit tests for bit_field.py
+"""
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import random
+import unittest
+
+import numpy as np
+
+from lib.bit_field import BitField
+from lib.field import Field
+from lib.tetris_driver import TetrisDriver
+from lib.tetromino import ORIENTATIONS, Tetromino
+from lib.test_field import assert_place_undo, generate_valid_state
+
+class TestBitField(unittest.TestCase):
+    def test_init(self):
+        field = BitField.create()
+        self.assertIsNotNone(field)
+        self.assertFalse(field.state.any())
+
+        state = generate_valid_state(np.array([
+            [1, 0, 0, 0, 0, 0, 0, 0, 0, 3],
+        ], dtype=np.uint8))
+        field = BitField.create(state)
+        self.assertIsNotNone(field)
+        self.assertEqual(field.rows[-1], 0b1000000001)
+        np.testing.assert_array_equal(field.state, state != 0)
+
+        self.assertIsNone(BitField.create(np.ones((2, 3))))
+
+    def test_drop(self):
+        field = BitField.create(generate_valid_state(np.array([
+            [1, 1, 0, 1, 1, 0, 1, 1, 0, 0],
+            [1, 1, 1, 1, 1, 1, 1, 1, 1, 0],
+        ], dtype=np.uint8)))
+        self.assertEqual(field.drop(Tetromino.JTetromino(), 0), 0)
+        np.testing.assert_array_equal(
+            field.state, generate_valid_state(np.array([
+                [1, 1, 1, 0, 0, 0, 0, 0, 0, 0],
+                [1, 1, 1, 1, 1, 0, 1, 1, 0, 0],
+                [1, 1, 1, 1, 1, 1, 1, 1, 1, 0],
+            ])))
+        self.assertEqual(
+            field.drop(Tetromino.TTetromino().rotate_right(), 8), 1)
+        np.testing.assert_array_equal(
+            field.state, generate_valid_state(np.array([
+                [1, 1, 1, 0, 0, 0, 0, 0, 0, 1],
+                [1, 1, 1, 1, 1, 0, 1, 1, 1, 1],
+            ])))
+        self.assertEqual(field.drop(Tetromino.ITetromino(), 7), -1)
+
+    def test_matches_field(self):
+        # Play identical games on a Field and a BitField and check that every
+        # observable quantity agrees after each drop.
+        rng = random.Random(0)
+        field, bit_field = Field.create(), BitField.create()
+        for _ in range(200):
+            tetromino = rng.choice(TetrisDriver.TETROMINOS).copy()
+            tetromino.rotate(rng.randrange(4))
+            column = rng.randrange(Field.WIDTH)
+            self.assertEqual(field.drop(tetromino, column),
+                             bit_field.drop(tetromino, column))
+            np.testing.assert_array_equal(field.state != 0, bit_field.state)
+            np.testing.assert_array_equal(field.heights(), bit_field.heights())
+            self.assertEqual(field.count_gaps(), bit_field.count_gaps())
+            self.assertEqual(field.column_gaps, bit_field.column_gaps)
+            self.assertEqual(field.column_gaps,
+                             BitField.create(field.state).column_gaps)
+            self.assertEqual(field.bumpiness(), bit_field.bumpiness())
+
+    def test_placements(self):
+        # Fill a field up to the top so that the placements near the top,
+        # which are found by scanning, are covered as well.
+        rng = random.Random(1)
+        field = Field.create()
+        while max(field.column_heights) < Field.HEIGHT - 1:
+            bit_field = BitField.create(field.state)
+            for orientations in [ORIENTATIONS['T'],
+                                 ORIENTATIONS['I'] + ORIENTATIONS['S']]:
+                expected, expected_boards = field.placements(orientations)
+                placements, boards = bit_field.placements(orientations)
+                self.assertEqual(placements, expected)
+                np.testing.assert_array_equal(boards, expected_boards)
+            orientation = rng.choice(rng.choice(list(ORIENTATIONS.values())))
+            field.drop(orientation.tetromino, rng.randrange(
+                Field.WIDTH - orientation.width + 1))
+
+    def test_copy(self):
+        field = BitField.create()
+        copy = field.copy()
+        copy.drop(Tetromino.OTetromino(), 0)
+        self.assertFalse(field.state.any())
+        self.assertTrue(copy.state.any())
+
+    def test_place_undo(self):
+        assert_place_undo(self, BitField)
+
+if __name__ == '__main__':
+    unittest.main()
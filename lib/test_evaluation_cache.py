@@ -0,0 +1,42 @@
+"""
+Unit tests for evaluation_cache.py
+"""
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import unittest
+
+import numpy as np
+
+from lib.evaluation_cache import EvaluationCache
+from lib.field import Field
+from lib.test_field import generate_valid_state
+
+class TestEvaluationCache(unittest.TestCase):
+    def test_lru_eviction(self):
+        cache = EvaluationCache(2)
+        cache.put(b'a', 1)
+        cache.put(b'b', 2)
+        self.assertEqual(cache.get(b'a'), 1)
+        # b is now the least recently used entry.
+        cache.put(b'c', 3)
+        self.assertIsNone(cache.get(b'b'))
+        self.assertEqual(cache.get(b'a'), 1)
+        self.assertEqual(cache.get(b'c'), 3)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+        cache.clear()
+        self.assertEqual((len(cache), cache.hits, cache.misses), (0, 0, 0))
+
+    def test_field_keys(self):
+        state = generate_valid_state(np.array([
+            [1, 0, 0, 0, 0, 0, 0, 0, 0, 0],
+            [1, 0, 1, 0, 1, 1, 1, 1, 1, 2],
+        ], dtype=np.uint8))
+        field = Field.create(state)
+        self.assertEqual(Field.board_keys(np.array([state != 0])),
+                         [field.key()])
+        self.assertNotEqual(field.key(), Field.create().key())
+
+if __name__ == '__main__':
+    unittest.main()
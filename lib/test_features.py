@@ -0,0 +1,108 @@
+"""
+Unit tests for features.py
+"""
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import unittest
+
+import numpy as np
+
+from lib.batch_tetris_driver import batch_placements
+from lib.bit_field import BitField
+from lib.features import DEFAULT_FEATURES, FEATURES, FIELD_FEATURES, \
+    FeatureExtractor
+from lib.field import Field
+from lib.test_field import generate_valid_state
+from lib.tetromino import ORIENTATIONS
+
+def well_field():
+    """
+    Returns a Field whose bottom four rows are full except for column 9,
+    with a gap in column 0 of the third row from the bottom.
+    """
+    state = np.ones((4, Field.WIDTH), dtype=np.uint8)
+    state[:, 9] = 0
+    state[1, 0] = 0
+    return Field.create(generate_valid_state(state))
+
+class TestFeatures(unittest.TestCase):
+    def values(self, names, field):
+        return FeatureExtractor.create(names).values(
+            (field.state != 0)[np.newaxis])[0].tolist()
+
+    def test_board_features(self):
+        field = well_field()
+        # Column 9 is empty, so the step next to it is 4.
+        self.assertEqual(
+            self.values(DEFAULT_FEATURES + ('max_height', 'bumpiness'), field),
+            [1, 3.6, 1.2, 4, 4, 4, 4])
+        # The gap has two transitions, and the empty column meets the full
+        # column beside it and the right wall in each of 4 rows, while the
+        # 18 empty rows meet both walls.
+        self.assertEqual(self.values(['row_transitions'], field),
+                         [2 + 2 * 4 + 2 * 18])
+        # Every column but the empty one has a transition at its top, and the
+        # gap adds two more, while the empty column meets the floor.
+        self.assertEqual(self.values(['column_transitions'], field),
+                         [9 + 2 + 1])
+        # The empty column is a well 4 deep.
+        self.assertEqual(self.values(['wells'], field), [1 + 2 + 3 + 4])
+
+    def test_moves(self):
+        field = well_field()
+        orientations = ORIENTATIONS['I']
+        placements, boards, moves = field.placements(orientations, True)
+        bit_placements, bit_boards, bit_moves = BitField.create(
+            field.state).placements(orientations, True)
+        _, _, _, batch_boards, batch_moves = batch_placements(
+            (field.state != 0)[np.newaxis], ['I'], True)
+        self.assertEqual(placements, bit_placements)
+        np.testing.assert_array_equal(boards, bit_boards)
+        np.testing.assert_array_equal(boards, batch_boards)
+        for other in [bit_moves, batch_moves]:
+            for name, values in moves.items():
+                np.testing.assert_array_equal(values, other[name])
+        # The vertical I tetromino in the well clears 3 lines, and 3 of its
+        # spaces with them.
+        index = placements.index((orientations[1], 9))
+        self.assertEqual(moves['landing_height'][index], 2)
+        self.assertEqual(moves['eroded_cells'][index], 9)
+        self.assertFalse(moves['eroded_cells'][np.arange(len(boards)) !=
+                                               index].any())
+        extractor = FeatureExtractor.create(['eroded_cells', 'gaps'])
+        np.testing.assert_array_equal(
+            extractor.values(boards, moves)[index], [9, 0])
+
+    def test_field_values(self):
+        names = list(FIELD_FEATURES)
+        extractor = FeatureExtractor.create(names)
+        fallback = FeatureExtractor.create(names + ['wells'])
+        self.assertIsNone(fallback.field_functions)
+        for field_class in [Field, BitField]:
+            field = field_class.create()
+            for orientation, column in [(ORIENTATIONS['I'][0], 0),
+                                        (ORIENTATIONS['T'][1], 4),
+                                        (ORIENTATIONS['Z'][1], 8),
+                                        (ORIENTATIONS['O'][0], 6)]:
+                field.drop(orientation.tetromino, column)
+                board = (field.state != 0)[np.newaxis]
+                np.testing.assert_almost_equal(
+                    extractor.field_values(field),
+                    extractor.values(board)[0])
+                np.testing.assert_almost_equal(
+                    fallback.field_values(field), fallback.values(board)[0])
+
+    def test_extractor(self):
+        boards = np.zeros((3, Field.HEIGHT, Field.WIDTH), dtype=bool)
+        values = FeatureExtractor.create(list(FEATURES)[:4]).values(boards)
+        self.assertEqual(values.shape, (3, 4))
+        self.assertIs(FeatureExtractor.create(DEFAULT_FEATURES),
+                      FeatureExtractor.create(list(DEFAULT_FEATURES)))
+        with self.assertRaises(ValueError):
+            FeatureExtractor.create(['landing_height']).values(boards)
+        with self.assertRaises(ValueError):
+            FeatureExtractor.create(['unknown'])
+
+if __name__ == '__main__':
+    unittest.main()
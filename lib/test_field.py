@@ -4,12 +4,13 @@ Unit tests for field.py
 # pylint: disable=missing-class-docstring
 # pylint: disable=missing-function-docstring
 
+import random
 import unittest
 
 import numpy as np
 
 from lib.field import Field
-from lib.tetromino import Tetromino
+from lib.tetromino import ORIENTATIONS, Tetromino
 
 def generate_valid_state(state):
     """
@@ -23,6 +24,45 @@ def generate_valid_state(state):
         state,
     ])
 
+def assert_place_undo(test, field_class):
+    """
+    Plays a seeded random game on a field of the given class, checking before
+    every drop that placing each orientation of a tetromino in each column and
+    undoing it clears the same lines as dropping it in a copy of the field,
+    and restores the field and its cached columns exactly.
+    """
+    # pylint: disable=protected-access
+    rng = random.Random(0)
+    def create():
+        # Start from a stack with a well, so that placements clear lines.
+        state = np.ones((4, Field.WIDTH), dtype=np.uint8)
+        state[:, rng.randrange(Field.WIDTH)] = 0
+        return field_class.create(generate_valid_state(state))
+    field = create()
+    for i in range(150):
+        before = field.copy()
+        orientations = rng.choice(list(ORIENTATIONS.values()))
+        for orientation in orientations:
+            for column in range(Field.WIDTH):
+                lines_cleared, record = field.place(
+                    orientation.tetromino, column)
+                dropped = before.copy()
+                test.assertEqual(
+                    lines_cleared, dropped.drop(orientation.tetromino, column))
+                if record is not None:
+                    np.testing.assert_array_equal(field.state, dropped.state)
+                    field.undo(record)
+                np.testing.assert_array_equal(field.state, before.state)
+                test.assertEqual(
+                    (field.column_heights, field.column_gaps,
+                     field._totals_()),
+                    (before.column_heights, before.column_gaps,
+                     before._totals_()))
+        orientation = rng.choice(orientations)
+        field.drop(orientation.tetromino, rng.randrange(Field.WIDTH))
+        if i % 10 == 0 or max(field.column_heights) > Field.HEIGHT - 4:
+            field = create()
+
 class FieldAssertions: # pylint: disable=too-few-public-methods, no-self-use
     def assertFieldsEqual(self, f1, f2): # pylint: disable=invalid-name
         """
@@ -149,5 +189,35 @@ class TestField(unittest.TestCase, FieldAssertions):
         expected_heights = np.array([4, 3, 3, 2, 0, 0, 0, 1, 4, 1])
         np.testing.assert_array_equal(field.heights(), expected_heights)
 
+    def test_cached_columns(self):
+        """
+        Test that the drop row computed from the cached column heights agrees
+        with scanning the field, and that the cached heights, gaps and totals
+        stay correct through drops and line clears.
+        """
+        # pylint: disable=protected-access
+        rng = random.Random(0)
+        field = Field.create()
+        for _ in range(300):
+            orientation = rng.choice(rng.choice(list(ORIENTATIONS.values())))
+            for column in range(Field.WIDTH - orientation.width + 1):
+                self.assertEqual(
+                    field._get_tetromino_drop_row_(
+                        orientation.tetromino, column),
+                    field._scan_drop_row_(orientation.tetromino, column))
+            field.drop(orientation.tetromino, rng.randrange(Field.WIDTH))
+            self.assertEqual(field.column_heights, field._compute_heights_())
+            expected = Field.create(field.state)
+            self.assertEqual(field.column_gaps, expected.column_gaps)
+            self.assertEqual(
+                (field.total_height, field.count_gaps(), field.bumpiness()),
+                (sum(expected.column_heights), expected.count_gaps(),
+                 int(np.abs(np.diff(expected.heights())).sum())))
+            if field.column_heights[0] > Field.HEIGHT - 4:
+                field = Field.create()
+
+    def test_place_undo(self):
+        assert_place_undo(self, Field)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,89 @@
+"""
+Unit tests for game_record.py
+"""
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from lib.bit_field import BitField
+from lib.field import Field
+from lib.game_record import GameRecord, GameRecorder
+from lib.genetic_algorithm.tetris_chromosome import TetrisChromosome
+from lib.piece_source import PieceSource
+from lib.tetris_driver import TetrisDriver
+
+class TestGameRecord(unittest.TestCase):
+    def setUp(self):
+        np.random.seed(0)
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'games')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_replay(self):
+        for field_class in [Field, BitField]:
+            self.replay(field_class)
+
+    def replay(self, field_class):
+        chromosome = TetrisChromosome.random(hold=True, search_depth=2)
+        record = GameRecord.create(seed=7, keyframe_interval=8)
+        driver = TetrisDriver.create(field_class.create(),
+                                     PieceSource.create(seed=7), n_preview=1,
+                                     hold=True, record=record)
+        fields = [driver.field.state != 0]
+        while driver.play(chromosome.strategy_callback) and \
+                driver.num_placed < 100:
+            fields.append(driver.field.state != 0)
+        path = self.path + field_class.__name__
+        recorder = GameRecorder.create(path)
+        recorder.write([record, GameRecord.create()])
+        recorder.close()
+
+        replayed, empty = GameRecord.read_all(path)
+        self.assertEqual((replayed.seed, empty.seed, len(empty)), (7, None, 0))
+        self.assertEqual(len(replayed), driver.num_placed)
+        self.assertEqual(int(replayed.lines_cleared().sum()),
+                         driver.lines_cleared)
+        source = PieceSource.create(seed=7)
+        self.assertEqual(replayed.tetromino_types(), [
+            source.next().type() for _ in range(len(record.pieces))])
+        for n_moves, field in enumerate(fields):
+            np.testing.assert_array_equal(
+                replayed.field_at(n_moves).state, field)
+
+    def test_batch_matches_serial(self):
+        chromosomes = [TetrisChromosome.random(n_simulations=2,
+                                               max_simulation_length=60)
+                       for _ in range(3)]
+        TetrisChromosome.game_recorder = GameRecorder.create(self.path)
+        try:
+            scores = TetrisChromosome.simulate_all(chromosomes, [1, 2, 3])
+            for chromosome, seed in zip(chromosomes, [1, 2, 3]):
+                chromosome.simulate(seed)
+        finally:
+            TetrisChromosome.game_recorder.close()
+            TetrisChromosome.game_recorder = None
+        records = list(GameRecord.read_all(self.path))
+        self.assertEqual(len(records), 12)
+        self.assertEqual([record.to_bytes() for record in records[:6]],
+                         [record.to_bytes() for record in records[6:]])
+        self.assertEqual([record.score() for record in records[:6]],
+                         [score for scores in scores for score in scores])
+
+    def test_seed(self):
+        for seed in [-1, 0, 1 - (1 << 64), (1 << 64) - 1]:
+            record, _ = GameRecord.from_bytes(
+                GameRecord.create(seed).to_bytes())
+            self.assertEqual(record.seed, seed)
+        for seed in [-1 << 64, 1 << 64]:
+            with self.assertRaises(ValueError):
+                GameRecord.create(seed)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+"""
+Unit tests for piece_source.py
+"""
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import unittest
+
+from lib.piece_source import PieceSource, SequencePieceSource, TETROMINOS
+from lib.tetris_driver import TetrisAction, TetrisDriver
+
+def deal(source, n_pieces):
+    return [source.next().type() for _ in range(n_pieces)]
+
+class TestPieceSource(unittest.TestCase):
+    def test_seeded(self):
+        for kind in PieceSource.KINDS:
+            self.assertEqual(deal(PieceSource.create(kind, seed=1), 50),
+                             deal(PieceSource.create(kind, seed=1), 50))
+
+    def test_bag(self):
+        types = deal(PieceSource.create(PieceSource.BAG, seed=0), 70)
+        for i in range(0, len(types), len(TETROMINOS)):
+            self.assertEqual(sorted(types[i:i + len(TETROMINOS)]),
+                             sorted(t.type() for t in TETROMINOS))
+
+    def test_unknown_kind(self):
+        with self.assertRaises(ValueError):
+            PieceSource.create('unknown')
+
+    def test_sequence(self):
+        source = SequencePieceSource.generate(10, seed=2)
+        types = deal(source, 20)
+        self.assertEqual(types[:10], deal(PieceSource.create(seed=2), 10))
+        self.assertEqual(types[:10], types[10:])
+
+    def test_tetris_driver(self):
+        sequence = SequencePieceSource.generate(100, PieceSource.BAG, seed=3)
+        drivers = [TetrisDriver.create(pieces=SequencePieceSource(
+            sequence.sequence)) for _ in range(2)]
+        strategy = lambda field, tetromino, *_: TetrisAction(tetromino, 0)
+        for driver in drivers:
+            while driver.play(strategy) and driver.num_placed < 100:
+                pass
+        self.assertEqual(drivers[0].num_placed, drivers[1].num_placed)
+        self.assertTrue((drivers[0].field.state ==
+                         drivers[1].field.state).all())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+"""
+Unit tests for profiler.py
+"""
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import unittest
+
+import numpy as np
+
+from lib import profiler
+from lib.field import Field
+from lib.genetic_algorithm.tetris_chromosome import TetrisChromosome
+from lib.piece_source import PieceSource
+from lib.tetris_driver import TetrisDriver
+
+class TestProfiler(unittest.TestCase):
+    def setUp(self):
+        self.drop = Field.drop
+        profiler.enable()
+
+    def tearDown(self):
+        profiler.disable()
+
+    def test_collect(self):
+        np.random.seed(0)
+        chromosome = TetrisChromosome.random()
+        driver = TetrisDriver.create(pieces=PieceSource.create(seed=0))
+        while driver.play(chromosome.strategy_callback) and \
+                driver.num_placed < 20:
+            pass
+        stats = profiler.collect()
+        self.assertEqual(stats['TetrisDriver.play'][0], driver.num_placed)
+        self.assertEqual(stats['TetrisChromosome.strategy_callback'][0],
+                         driver.num_placed)
+        self.assertGreaterEqual(stats['Field.drop'][0], driver.num_placed)
+        for calls, seconds in stats.values():
+            self.assertGreater(calls, 0)
+            self.assertGreaterEqual(seconds, 0)
+        self.assertEqual(profiler.collect(), {})
+        self.assertIn('TetrisDriver.play', profiler.summary(stats))
+
+    def test_merge(self):
+        self.assertEqual(
+            profiler.merge({'a': (1, 1.0)}, {'a': (2, 0.5), 'b': (1, 2.0)}),
+            {'a': (3, 1.5), 'b': (1, 2.0)})
+
+    def test_disable(self):
+        self.assertIsNot(Field.drop, self.drop)
+        profiler.disable()
+        self.assertFalse(profiler.enabled())
+        self.assertIs(Field.drop, self.drop)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+"""
+Unit tests for terminal_renderer.py
+"""
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import io
+import unittest
+
+from lib.bit_field import BitField
+from lib.field import Field
+from lib.terminal_renderer import TerminalRenderer
+from lib.tetromino import Tetromino
+
+class TestTerminalRenderer(unittest.TestCase):
+    def test_render(self):
+        stream = io.StringIO()
+        renderer = TerminalRenderer.create(stream, fps=0)
+        field = Field.create()
+        renderer.render(field, 'first')
+        self.assertIn(str(field), stream.getvalue())
+        self.assertTrue(stream.getvalue().endswith('first'))
+
+        # Only the spaces the tetromino filled are redrawn.
+        stream.seek(0)
+        stream.truncate()
+        field.drop(Tetromino.OTetromino(), 0)
+        renderer.render(field, 'second')
+        self.assertEqual(stream.getvalue(), ''.join([
+            '\x1b[22;5HO', '\x1b[22;7HO', '\x1b[23;5HO', '\x1b[23;7HO',
+            '\x1b[25;1H\x1b[Ksecond']))
+
+        stream.seek(0)
+        stream.truncate()
+        renderer.render(field)
+        self.assertEqual(stream.getvalue(), '\x1b[25;1H\x1b[K')
+
+    def test_render_bit_field(self):
+        # The first frame and later changes are drawn with the same table.
+        stream = io.StringIO()
+        renderer = TerminalRenderer.create(stream, fps=0)
+        field = BitField.create()
+        field.drop(Tetromino.OTetromino(), 0)
+        renderer.render(field)
+        self.assertIn('# #', stream.getvalue())
+        self.assertNotIn('O', stream.getvalue())
+        stream.seek(0)
+        stream.truncate()
+        field.drop(Tetromino.ITetromino(), 4)
+        renderer.render(field)
+        self.assertEqual(stream.getvalue(), ''.join([
+            '\x1b[23;13H#', '\x1b[23;15H#', '\x1b[23;17H#', '\x1b[23;19H#',
+            '\x1b[25;1H\x1b[K']))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+"""
+Unit tests for tetris_driver.py
+"""
+# pylint: disable=missing-class-docstring
+# pylint: disable=missing-function-docstring
+
+import unittest
+
+from lib.piece_source import PieceSource, SequencePieceSource
+from lib.tetris_driver import TetrisAction, TetrisDriver
+
+class TestTetrisDriver(unittest.TestCase):
+    def setUp(self):
+        self.sequence = SequencePieceSource.generate(50, seed=0).sequence
+        self.types = [tetromino.type() for tetromino in self.sequence]
+
+    def test_preview(self):
+        driver = TetrisDriver.create(
+            pieces=SequencePieceSource(self.sequence), n_preview=3)
+        seen = []
+        def strategy(_, tetromino, held_tetromino, preview):
+            self.assertIsNone(held_tetromino)
+            seen.append([tetromino.type()] +
+                        [upcoming.type() for upcoming in preview])
+            return TetrisAction(tetromino, 0) if len(seen) < 10 else None
+        while driver.play(strategy):
+            pass
+        for i, types in enumerate(seen):
+            self.assertEqual(types, self.types[i:i + 4])
+
+    def test_hold(self):
+        driver = TetrisDriver.create(
+            pieces=SequencePieceSource(self.sequence), hold=True)
+        self.assertEqual(driver.held_tetromino.type(), self.types[0])
+        # Always playing the held tetromino plays every tetromino one move
+        # late, keeping the last one dealt in the hold.
+        played = []
+        def strategy(_, tetromino, held_tetromino, preview):
+            self.assertEqual(preview, ())
+            self.assertEqual(tetromino.type(), self.types[len(played) + 1])
+            played.append(held_tetromino.type())
+            return TetrisAction(held_tetromino, 0) if len(played) < 5 else None
+        while driver.play(strategy):
+            pass
+        self.assertEqual(played, self.types[:5])
+        self.assertEqual(driver.num_placed, 4)
+        self.assertEqual(driver.held_tetromino.type(), self.types[4])
+
+    def test_default_pieces(self):
+        driver = TetrisDriver.create(pieces=PieceSource.create(seed=0))
+        self.assertIsNone(driver.held_tetromino)
+        self.assertEqual(len(driver.preview), 0)
+
+if __name__ == '__main__':
+    unittest.main()
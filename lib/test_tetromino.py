@@ -8,7 +8,7 @@ import unittest
 
 import numpy as np
 
-from lib.tetromino import Tetromino
+from lib.tetromino import ORIENTATIONS, Tetromino
 
 class TetrominoAssertions: # pylint: disable=too-few-public-methods, no-self-use
     def assertTetrominosEqual(self, t1, t2): # pylint: disable=invalid-name
@@ -187,5 +187,26 @@ class TestTetromino(unittest.TestCase, TetrominoAssertions):
         self.assertTetrominosEqual(tetromino.rotate_left(), expected2)
         self.assertTetrominosEqual(tetromino.rotate_left(), expected1)
 
+    def test_orientations(self):
+        self.assertEqual(
+            {letter: len(orientations)
+             for letter, orientations in ORIENTATIONS.items()},
+            {'I': 2, 'O': 1, 'T': 4, 'S': 2, 'Z': 2, 'J': 4, 'L': 4})
+        for orientations in ORIENTATIONS.values():
+            for orientation in orientations:
+                tetromino = getattr(
+                    Tetromino, f'{orientation.tetromino.type()}Tetromino')()
+                tetromino.rotate(orientation.rotation)
+                self.assertTetrominosEqual(orientation.tetromino, tetromino)
+                self.assertIs(tetromino.orientation(), orientation)
+
+        orientation = Tetromino.TTetromino().rotate_right().orientation()
+        self.assertEqual(orientation.width, 2)
+        self.assertEqual(orientation.bottoms, (1, 2))
+        self.assertEqual(orientation.row_masks, (0b10, 0b11, 0b10))
+        orientation = Tetromino.LTetromino().orientation()
+        self.assertEqual(orientation.bottoms, (1, 0, 0))
+        self.assertEqual(orientation.row_masks, (0b111, 0b001))
+
 if __name__ == '__main__':
     unittest.main()
@@ -2,9 +2,10 @@
 TetrisDriver allows for a game to played with a given input strategy.
 """
 
-import random
+import collections
 
 from lib.field import Field
+from lib.piece_source import PieceSource, TETROMINOS
 from lib.tetromino import Tetromino
 
 class TetrisAction(): # pylint: disable=too-few-public-methods
@@ -21,45 +22,82 @@ class TetrisAction(): # pylint: disable=too-few-public-methods
 
 class TetrisDriver(): # pylint: disable=missing-class-docstring
 
-    TETROMINOS = [
-        Tetromino.ITetromino(),
-        Tetromino.OTetromino(),
-        Tetromino.TTetromino(),
-        Tetromino.STetromino(),
-        Tetromino.ZTetromino(),
-        Tetromino.JTetromino(),
-        Tetromino.LTetromino()
-    ]
+    TETROMINOS = TETROMINOS
 
-    def __init__(self, field):
+    def __init__(self, field, pieces, n_preview=0, hold=False, record=None):
+        """
+        Initializes a TetrisDriver, which deals tetrominos from the given
+        PieceSource and lets strategies see the next n_preview tetrominos. If
+        hold is True, a tetromino is dealt into the hold before the game
+        starts, and every move may play either the next tetromino or the held
+        one, which swaps them. If a GameRecord is given, every tetromino dealt
+        and every move played is recorded into it. Invoke TetrisDriver.create()
+        instead.
+        """
         self.field = field
-        self.held_tetromino = None
+        self.pieces = pieces
+        self.record = record
+        self.held_tetromino = self._deal_() if hold else None
+        self.preview = collections.deque(
+            self._deal_() for _ in range(n_preview))
         self.num_placed = 0
         self.lines_cleared = 0
 
     @staticmethod
-    def create(field=None):
+    def create(field=None, pieces=None, n_preview=0, hold=False, record=None):
         """
         Factory method to create a TetrisDriver, taking an optional Field with
-        which to initialize the game with.
+        which to initialize the game with and an optional PieceSource to deal
+        tetrominos from. If no PieceSource is given, tetrominos are drawn
+        uniformly using the random module.
+        """
+        return TetrisDriver(Field.create() if field is None else field,
+                            PieceSource.create() if pieces is None else pieces,
+                            n_preview, hold, record)
+
+    def _deal_(self):
+        """
+        Deals a tetromino from the PieceSource, recording it if recording.
+        """
+        tetromino = self.pieces.next()
+        if self.record is not None:
+            self.record.deal(tetromino.type())
+        return tetromino
+
+    def _next_tetromino_(self):
+        """
+        Deals the next tetromino, refilling the preview from the PieceSource.
         """
-        return TetrisDriver(Field.create() if field is None else field)
+        if not self.preview:
+            return self._deal_()
+        self.preview.append(self._deal_())
+        return self.preview.popleft()
 
     def play(self, strategy):
         """
         Given a strategy callback which takes the current Field, the next
-        Tetromino, and the held Tetromino, and returns a TetrisAction or None.
-        This method will play the TetrisAction if provided, or return None if
-        one if the TetrisAction was None, indicating the game is over.
+        Tetromino, the held Tetromino, and a tuple of the upcoming Tetrominos,
+        and returns a TetrisAction or None. This method will play the
+        TetrisAction if provided, or return None if one if the TetrisAction was
+        None, indicating the game is over. Playing the held Tetromino puts the
+        next Tetromino in the hold.
         """
-        tetromino = random.choice(TetrisDriver.TETROMINOS)
-        action = strategy(self.field, tetromino, self.held_tetromino)
+        tetromino = self._next_tetromino_()
+        action = strategy(self.field, tetromino, self.held_tetromino,
+                          tuple(self.preview))
         if action is None:
             return False
-        valid_tetromino_types = [tetromino.type()] if self.held_tetromino is \
-            None else [tetromino.type(), self.held_tetromino.type()]
-        assert action.tetromino.tetromino_type in valid_tetromino_types
+        if action.tetromino.tetromino_type != tetromino.tetromino_type:
+            assert self.held_tetromino is not None and \
+                action.tetromino.tetromino_type == \
+                self.held_tetromino.tetromino_type
+            self.held_tetromino = tetromino
         lines_cleared = self.field.drop(action.tetromino, action.column)
+        if self.record is not None:
+            self.record.move(action.tetromino.type(),
+                             action.tetromino.orientation().rotation,
+                             action.column, max(lines_cleared, 0),
+                             self.field)
         self.num_placed += 1
         self.lines_cleared += lines_cleared if lines_cleared > 0 else 0
         return True
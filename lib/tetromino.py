@@ -1,5 +1,7 @@
 """
-The Tetromino class encapsulates a Tetris tetromino as a numpy array.
+The Tetromino class encapsulates a Tetris tetromino as a numpy array. This
+module also builds the ORIENTATIONS table, which holds the distinct rotations of
+every tetromino type along with the data needed to place them in a field.
 """
 
 import numpy as np
@@ -149,3 +151,64 @@ class Tetromino(): # pylint: disable=missing-class-docstring
         Utility method for less typing.
         """
         return self.tetromino_type
+
+    def orientation(self):
+        """
+        Returns the precomputed Orientation matching this Tetromino's type and
+        current rotation, or computes one if this Tetromino is not a standard
+        tetromino.
+        """
+        if (orientation := Orientation.LOOKUP.get((
+                self.tetromino_type, self.state.shape,
+                self.state.tobytes()))) is None:
+            orientation = Orientation(self.copy(), None)
+        return orientation
+
+class Orientation(): # pylint: disable=too-few-public-methods
+    """
+    A data class holding one distinct rotation of a tetromino type, precomputed
+    once so that placing it in a field requires no per-move work.
+
+    rotation is the number of clockwise quarter turns from the spawn
+    orientation, cells holds the row and column offsets of the filled spaces,
+    tops and bottoms hold the row offsets of the highest and lowest
+    filled spaces in each column of the tetromino, and row_masks holds each row
+    of the tetromino as a bitmask in which bit i is set if column i is filled.
+    """
+
+    LOOKUP = {}
+
+    def __init__(self, tetromino, rotation):
+        self.tetromino = tetromino
+        self.rotation = rotation
+        self.width = tetromino.width()
+        self.height = tetromino.height()
+        self.filled = tetromino.state != 0
+        self.cells = np.nonzero(self.filled)
+        self.tops = tuple(
+            int(top) for top in np.argmax(self.filled, axis=0))
+        self.bottoms = tuple(int(bottom) for bottom in self.height - 1 -
+                             np.argmax(self.filled[::-1], axis=0))
+        self.row_masks = tuple(
+            int(row @ (1 << np.arange(self.width))) for row in self.filled)
+
+def _build_orientations_():
+    """
+    Builds the table of distinct orientations for every tetromino type, in
+    order of increasing clockwise rotation.
+    """
+    orientations = {}
+    for tetromino_type in Tetromino.TYPES[1:]:
+        orientations[tetromino_type] = []
+        for rotation in range(4):
+            tetromino = getattr(Tetromino, f'{tetromino_type}Tetromino')()
+            tetromino.rotate(rotation)
+            key = (tetromino_type, tetromino.state.shape,
+                   tetromino.state.tobytes())
+            if key not in Orientation.LOOKUP:
+                Orientation.LOOKUP[key] = Orientation(tetromino, rotation)
+                orientations[tetromino_type].append(Orientation.LOOKUP[key])
+        orientations[tetromino_type] = tuple(orientations[tetromino_type])
+    return orientations
+
+ORIENTATIONS = _build_orientations_()
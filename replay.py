@@ -0,0 +1,74 @@
+"""
+Utility script to inspect games recorded by train.py or show.py with the
+--record option.
+Invoke with the -h flag for help.
+"""
+# pylint: disable=missing-function-docstring
+
+import argparse
+import itertools
+import statistics
+
+from lib.game_record import GameRecord
+from lib.terminal_renderer import TerminalRenderer
+
+def summarize(records):
+    scores = []
+    for i, record in enumerate(records):
+        lines_cleared = int(record.lines_cleared().sum())
+        # Scored the same way as fitness during training.
+        scores.append(record.score())
+        print(f'Game {i}: seed {record.seed}, {len(record)} tetrominos '
+              f'placed, {lines_cleared} lines cleared, score {scores[-1]}')
+    if scores:
+        print(f'{len(scores)} games, scores: mean '
+              f'{statistics.mean(scores):.1f}, median '
+              f'{statistics.median(scores):.1f}, min {min(scores)}, '
+              f'max {max(scores)}')
+
+def animate(record, start, fps):
+    renderer = TerminalRenderer.create(fps=fps)
+    field = record.field_at(start)
+    lines_cleared = int(record.lines_cleared()[:start].sum())
+    renderer.render(field, f'Placed: {start}  Lines: {lines_cleared}')
+    for index in range(start, len(record)):
+        orientation, column = record.placement(index)
+        lines_cleared += max(field.drop(orientation.tetromino, column), 0)
+        renderer.render(field, f'Placed: {index + 1}  Lines: {lines_cleared}')
+    renderer.close()
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Summarizes or replays recorded games of tetris.')
+    parser.add_argument('records', help='File of recorded games')
+    parser.add_argument(
+        '--game', type=int,
+        help='Index of a game to replay instead of summarizing every game')
+    parser.add_argument(
+        '--move', type=int, default=0,
+        help='Number of moves into the game to start replaying from')
+    parser.add_argument(
+        '--fps', type=float, default=TerminalRenderer.DEFAULT_FPS,
+        help='Frames drawn per second, 0 for as fast as possible')
+    parser.add_argument(
+        '--still', action='store_true',
+        help='Only print the field after --move moves')
+
+    args = parser.parse_args()
+    records = GameRecord.read_all(args.records)
+    if args.game is None:
+        summarize(records)
+        return
+    record = (next(itertools.islice(records, args.game, None), None)
+              if args.game >= 0 else None)
+    if record is None:
+        parser.error(f'There is no game {args.game}')
+    if not 0 <= args.move <= len(record):
+        parser.error(f'Game {args.game} has {len(record)} moves')
+    if args.still:
+        print(record.field_at(args.move))
+    else:
+        animate(record, args.move, args.fps)
+
+if __name__ == '__main__':
+    main()
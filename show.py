@@ -8,28 +8,69 @@ Invoke with the -h flag for help.
 # pylint: disable=missing-function-docstring
 
 import argparse
+import multiprocessing
 import pickle
-import time
+import statistics
 
+from lib import profiler
+from lib.features import DEFAULT_FEATURES, FEATURES
+from lib.game_record import GameRecorder
+from lib.piece_source import PieceSource
+from lib.terminal_renderer import TerminalRenderer
 from lib.tetris_driver import TetrisDriver
 from lib.genetic_algorithm.tetris_chromosome import TetrisChromosome
 
-FIELDS = [
-    'Gap Count:\t\t\t{:0.8f}',
-    'Mean Column Heights:\t\t{:0.8f}',
-    'Stddev Column Heights:\t\t{:0.8f}',
-    'Maxmin Height Difference:\t{:0.8f}',
-    'ediff1d sum:\t\t\t{:0.8f}'
-]
-
-def show(genes):
-    driver = TetrisDriver.create()
-    chromosome = TetrisChromosome.create(genes)
-    while driver.play(chromosome.strategy_callback):
-        print(driver.field)
-        time.sleep(0.1)
-    print(f'Number of tetrominos placed: {driver.num_placed}')
-    print(f'Number of lines cleared: {driver.lines_cleared}')
+def play(genes, settings, seed, max_length=0, renderer=None,
+         recorder=None):
+    """
+    Plays a game seeded with the given seed using the given genes and
+    chromosome settings, drawing every move with the renderer and recording
+    the game with the recorder if they are given. Returns the number of
+    tetrominos placed, the number of lines cleared and the profiler statistics
+    of the game.
+    """
+    chromosome = TetrisChromosome.create(genes, **settings)
+    record = None if recorder is None else recorder.start(seed)
+    driver = TetrisDriver.create(
+        pieces=PieceSource.create(chromosome.piece_source, seed),
+        n_preview=chromosome.search_depth - 1, hold=chromosome.hold,
+        record=record)
+    while (not max_length or driver.num_placed < max_length) and \
+            driver.play(chromosome.strategy_callback):
+        if renderer is not None:
+            renderer.render(driver.field, f'Placed: {driver.num_placed}  '
+                                          f'Lines: {driver.lines_cleared}')
+    if record is not None:
+        recorder.write([record])
+    return driver.num_placed, driver.lines_cleared, profiler.collect()
+
+def show(genes, settings, seeds, max_length, workers, renderer, recorder):
+    if renderer is not None:
+        games = [play(genes, settings, seeds[0], max_length, renderer,
+                      recorder)]
+        renderer.close()
+    elif workers > 1:
+        with multiprocessing.Pool(workers) as pool:
+            games = pool.starmap(play, [
+                (genes, settings, seed, max_length, None, recorder)
+                for seed in seeds])
+    else:
+        games = [play(genes, settings, seed, max_length, None, recorder)
+                 for seed in seeds]
+    for seed, (num_placed, lines_cleared, _) in zip(seeds, games):
+        print(f'Seed {seed}:')
+        print(f'Number of tetrominos placed: {num_placed}')
+        print(f'Number of lines cleared: {lines_cleared}')
+    if len(games) > 1:
+        # Scored the same way as fitness during training.
+        scores = [num_placed + lines_cleared
+                  for num_placed, lines_cleared, _ in games]
+        print(f'Scores: mean {statistics.mean(scores):.1f}, '
+              f'median {statistics.median(scores):.1f}, '
+              f'min {min(scores)}, max {max(scores)}')
+    if profiler.enabled():
+        print(profiler.summary(profiler.merge(
+            *(profile for _, _, profile in games))))
 
 def main():
     parser = argparse.ArgumentParser(
@@ -40,15 +81,77 @@ def main():
         help='Show the numeric values in the chromosome instead of simulating '
              'it on Tetris',
         action='store_true')
+    parser.add_argument(
+        '--fast',
+        help='Play without drawing the game and only report the results',
+        action='store_true')
+    parser.add_argument(
+        '--games', type=int, default=1,
+        help='Number of games to play, requires --fast if more than 1')
+    parser.add_argument(
+        '--seed', type=int, default=0,
+        help='Seed of the first game, each later game uses the next seed')
+    parser.add_argument(
+        '--workers', type=int, default=1,
+        help='Number of processes to play the games in')
+    parser.add_argument(
+        '--max_length', type=int, default=0,
+        help='Number of tetrominos after which a game stops, 0 for no limit')
+    parser.add_argument(
+        '--fps', type=float, default=TerminalRenderer.DEFAULT_FPS,
+        help='Frames drawn per second, 0 for as fast as possible')
+    parser.add_argument(
+        '--piece_source', choices=PieceSource.KINDS,
+        default=PieceSource.UNIFORM,
+        help='How tetrominos are dealt')
+    parser.add_argument(
+        '--hold', action='store_true', help='Let the game hold a tetromino')
+    parser.add_argument(
+        '--search_depth', type=int, default=TetrisChromosome.SEARCH_DEPTH,
+        help='Number of tetrominos to search ahead per move, including the '
+             'current one')
+    parser.add_argument(
+        '--beam_width', type=int, default=TetrisChromosome.BEAM_WIDTH,
+        help='Number of fields kept at each ply of the search')
+    parser.add_argument(
+        '--features', nargs='+', choices=list(FEATURES),
+        default=list(DEFAULT_FEATURES),
+        help='Features of each field the genes weigh, in order')
+    parser.add_argument(
+        '--record', help='File to append a log of every game played to')
+    parser.add_argument(
+        '--profile',
+        help='Count and time calls to the hot paths of the game and print a '
+             'summary once it is over',
+        action='store_true')
 
     args = parser.parse_args()
+    if args.games > 1 and not args.fast:
+        parser.error('--games above 1 requires --fast')
+    if args.profile:
+        profiler.enable()
     with args.gene as gene:
         genes = pickle.load(gene)
+        if len(genes) != len(args.features):
+            parser.error('the gene file has {} genes for {} features'.format(
+                len(genes), len(args.features)))
         if args.no_sim:
-            for i, field in enumerate(FIELDS):
-                print(field.format(genes[i]))
+            for name, weight in zip(args.features, genes):
+                print(f'{name + ":":24}{weight:0.8f}')
         else:
-            show(genes)
+            settings = {
+                'piece_source': args.piece_source,
+                'hold': args.hold,
+                'search_depth': args.search_depth,
+                'beam_width': args.beam_width,
+                'features': tuple(args.features),
+            }
+            show(genes, settings,
+                 [args.seed + i for i in range(args.games)], args.max_length,
+                 args.workers,
+                 None if args.fast else TerminalRenderer.create(fps=args.fps),
+                 None if args.record is None else
+                 GameRecorder.create(args.record))
 
 if __name__ == '__main__':
     main()
@@ -7,11 +7,19 @@ Parameterizable via command line options, invoke with the -h flag.
 # pylint: disable=missing-function-docstring
 
 import argparse
+import os
 import pickle
 import random
 
+from lib import profiler
+from lib.evaluation_cache import EvaluationCache
+from lib.features import DEFAULT_FEATURES, FEATURES
+from lib.game_record import GameRecorder
+from lib.genetic_algorithm.metrics_sink import MetricsSink
 from lib.genetic_algorithm.population import Population
 from lib.genetic_algorithm.tetris_chromosome import TetrisChromosome
+from lib.genetic_algorithm.work_queue import AUTHKEY_VARIABLE, WorkQueue
+from lib.piece_source import PieceSource
 
 def main():
     parser = argparse.ArgumentParser(description='Runs genetic algorithm.')
@@ -27,30 +35,151 @@ def main():
                         default=TetrisChromosome.MAX_SIMULATION_LENGTH)
     parser.add_argument('--mutation_chance', type=float,
                         default=Population.DEFAULT_MUTATION_CHANCE)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of processes to evaluate fitness with, '
+                             'or with --serve, number of tasks to split each '
+                             'evaluation into')
+    parser.add_argument('--serve',
+                        help='Evaluate fitness in worker.py processes '
+                             'connecting to this host:port or Unix socket '
+                             'path instead, authenticated with the key in '
+                             'the {} environment variable'.format(
+                                 AUTHKEY_VARIABLE))
+    parser.add_argument('--worker_timeout', type=float,
+                        help='Seconds after which a task given to a worker '
+                             'with --serve is given to another one')
+    parser.add_argument('--cache_size', type=int, default=0,
+                        help='Number of field evaluations to cache per '
+                             'process. Only about 0.8%% of lookups hit on a '
+                             'serial run, so this is roughly break-even, not '
+                             'a speedup')
+    parser.add_argument('--piece_source', choices=PieceSource.KINDS,
+                        default=PieceSource.UNIFORM,
+                        help='How tetrominos are dealt in simulated games')
+    parser.add_argument('--hold', action='store_true',
+                        help='Let simulated games hold a tetromino')
+    parser.add_argument('--search_depth', type=int,
+                        default=TetrisChromosome.SEARCH_DEPTH,
+                        help='Number of tetrominos to search ahead per move, '
+                             'including the current one')
+    parser.add_argument('--beam_width', type=int,
+                        default=TetrisChromosome.BEAM_WIDTH,
+                        help='Number of fields kept at each ply of the search')
+    parser.add_argument('--features', nargs='+', choices=list(FEATURES),
+                        default=list(DEFAULT_FEATURES),
+                        help='Features of each field the genes weigh, in '
+                             'order')
+    parser.add_argument('--common_random_numbers', action='store_true',
+                        help='Evaluate chromosomes together on the same games')
+    parser.add_argument('--racing', action='store_true',
+                        help='Stop simulating chromosomes once it is clear '
+                             'which side of the selection cut they are on')
+    parser.add_argument('--steady_state', action='store_true',
+                        help='Replace the least fit member with each child '
+                             'as soon as it is evaluated instead of breeding '
+                             'whole generations')
+    parser.add_argument('--checkpoint',
+                        help='File to periodically save the population to')
+    parser.add_argument('--checkpoint_interval', type=int, default=1,
+                        help='Number of generations between checkpoints')
+    parser.add_argument('--resume', action='store_true',
+                        help='Resume from the checkpoint file if it exists, '
+                             'running only the remaining generations')
+    parser.add_argument('--metrics',
+                        help='JSON Lines file to append generation metrics to')
+    parser.add_argument('--quiet', action='store_true',
+                        help='Do not print every member of every generation')
+    parser.add_argument('--record',
+                        help='File to append a log of every simulated game to')
+    parser.add_argument('--profile', action='store_true',
+                        help='Count and time calls to the hot paths of the '
+                             'game and print a summary every generation')
+    parser.add_argument('--fitness_policy',
+                        choices=Population.FITNESS_POLICIES,
+                        default=Population.RECALCULATE,
+                        help='How to evaluate the survivors of a generation')
     args = parser.parse_args()
+    if args.resume and args.checkpoint is None:
+        parser.error('--resume requires --checkpoint')
+    if args.serve is not None and not os.environ.get(AUTHKEY_VARIABLE):
+        parser.error('--serve requires a key in {}'.format(AUTHKEY_VARIABLE))
+    if args.steady_state and (args.racing or args.common_random_numbers or
+                              args.fitness_policy != Population.RECALCULATE):
+        parser.error('--steady_state does not support --racing, '
+                     '--common_random_numbers or --fitness_policy, as '
+                     'survivors always keep their fitness')
 
     random.seed(0)
 
+    if args.profile:
+        profiler.enable()
+
+    if args.cache_size > 0:
+        TetrisChromosome.evaluation_cache = EvaluationCache(args.cache_size)
+    if args.record is not None:
+        TetrisChromosome.game_recorder = GameRecorder.create(args.record)
+
+    settings = {
+        'piece_source': args.piece_source,
+        'hold': args.hold,
+        'search_depth': args.search_depth,
+        'beam_width': args.beam_width,
+        'features': tuple(args.features),
+    }
     chromosomes = []
     if args.seed:
         with args.seed as seed:
             genes = pickle.load(seed)
+            if len(genes) != len(args.features):
+                parser.error('the seed has {} genes for {} features'.format(
+                    len(genes), len(args.features)))
             for _ in range(args.population_size):
                 chromosomes.append(TetrisChromosome.create(
-                    genes, args.n_simulations, args.max_simulation_length))
+                    genes, args.n_simulations, args.max_simulation_length,
+                    **settings))
     else:
         for _ in range(args.population_size):
             chromosomes.append(TetrisChromosome.random(
-                args.n_simulations, args.max_simulation_length))
+                args.n_simulations, args.max_simulation_length, **settings))
 
-    population = Population(chromosomes, args.mutation_chance)
-    population.run(args.generations)
+    metrics = None if args.metrics is None else \
+        MetricsSink.create(args.metrics)
+    work_queue = None
+    if args.serve is not None:
+        work_queue = WorkQueue.create(
+            args.serve, os.environ[AUTHKEY_VARIABLE].encode(),
+            args.worker_timeout)
+        print('Serving evaluation tasks on {}'.format(work_queue.address))
+    population = Population(chromosomes, args.mutation_chance, args.workers,
+                            args.fitness_policy, args.common_random_numbers,
+                            args.racing, metrics, not args.quiet, work_queue,
+                            args.steady_state)
+    if args.resume and os.path.exists(args.checkpoint):
+        try:
+            population.load_checkpoint(args.checkpoint)
+        except ValueError as error:
+            parser.error('cannot resume from {}: {}'.format(args.checkpoint,
+                                                            error))
+        print('Resumed from generation {}'.format(population.generations))
+    population.run(max(args.generations - population.generations, 0),
+                   args.checkpoint, args.checkpoint_interval)
+    if metrics is not None:
+        metrics.close()
+    if work_queue is not None:
+        work_queue.close()
     fittest = population.get_fittest_member()
 
     with args.outfile as outfile:
         pickle.dump(fittest.genes, outfile)
         print('Fittest member: {}'.format(fittest))
         print('Result dumped to {}'.format(outfile))
+    if population.cache_counts.any():
+        # The caches of worker processes are not this process's, so report
+        # the counts summed over every process which evaluated fitness.
+        hits, misses = population.cache_counts.tolist()
+        print('Evaluation cache: Hits: {} \t Misses: {} \t Hit rate: '
+              '{:.2%}'.format(hits, misses,
+                              hits / (hits + misses) if hits + misses else 0))
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,55 @@
+"""
+Executable CLI to evaluate fitness for a train.py run started with the --serve
+option, possibly on another machine.
+Invoke with the -h flag for help.
+"""
+# pylint: disable=missing-function-docstring
+
+import argparse
+import os
+
+from lib import profiler
+from lib.evaluation_cache import EvaluationCache
+from lib.game_record import GameRecorder
+from lib.genetic_algorithm.tetris_chromosome import TetrisChromosome
+from lib.genetic_algorithm.work_queue import AUTHKEY_VARIABLE, work
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Evaluates fitness for a training run.')
+    parser.add_argument(
+        'address',
+        help='host:port or Unix socket path the training run is serving on, '
+             'authenticated with the key in the {} environment '
+             'variable'.format(AUTHKEY_VARIABLE))
+    parser.add_argument(
+        '--connect_timeout', type=float, default=60,
+        help='Seconds to keep trying to connect to the training run')
+    parser.add_argument(
+        '--cache_size', type=int, default=0,
+        help='Number of field evaluations to cache. Only about 0.8%% of '
+             'lookups hit, so this is roughly break-even, not a speedup')
+    parser.add_argument(
+        '--record', help='File to append a log of every simulated game to')
+    parser.add_argument(
+        '--profile', action='store_true',
+        help='Count and time calls to the hot paths of the game and send them '
+             'to the training run')
+    args = parser.parse_args()
+    if not os.environ.get(AUTHKEY_VARIABLE):
+        parser.error('a key is required in {}'.format(AUTHKEY_VARIABLE))
+
+    if args.profile:
+        profiler.enable()
+    if args.cache_size > 0:
+        TetrisChromosome.evaluation_cache = EvaluationCache(args.cache_size)
+    if args.record is not None:
+        TetrisChromosome.game_recorder = GameRecorder.create(args.record)
+    n_tasks = work(args.address, os.environ[AUTHKEY_VARIABLE].encode(),
+                   args.connect_timeout)
+    print('Ran {} tasks'.format(n_tasks))
+    if TetrisChromosome.game_recorder is not None:
+        TetrisChromosome.game_recorder.close()
+
+if __name__ == '__main__':
+    main()